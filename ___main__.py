@@ -1,15 +1,36 @@
 from __future__ import annotations
 
-from asyncio import AbstractEventLoop, CancelledError, get_event_loop, run
-from logging import Logger, getLogger
+import os
+import sys
 from os import environ
-from typing import TYPE_CHECKING
 
-from aiohttp import ClientSession
-
-from base import Settings, setup_logging
-from bot import RoboLia
-from utils import suppress
+from startup import profiler
+
+# Before anything else is imported, or the import tree misses it.
+if "--profile-startup" in sys.argv or environ.get("ROBOLIA_PROFILE_STARTUP"):
+    profiler.enable()
+
+from asyncio import AbstractEventLoop, CancelledError, gather, get_event_loop, run  # noqa: E402
+from logging import Logger, getLogger  # noqa: E402
+from typing import TYPE_CHECKING, Any  # noqa: E402
+
+from aiohttp import ClientSession  # noqa: E402
+
+from base import (  # noqa: E402
+    Cluster,
+    ClusterHealth,
+    ExecutorLanes,
+    IdentifyLimiter,
+    LaneConfig,
+    ResumeStore,
+    Settings,
+    SharedResources,
+    metrics,
+    setup_logging,
+)
+from bot import RoboLia  # noqa: E402
+from startup import StartupGraph  # noqa: E402
+from utils import suppress  # noqa: E402
 
 if TYPE_CHECKING:
     from asyncpg import Pool, Record
@@ -30,16 +51,33 @@ async def setup() -> tuple[RoboLia, Pool[Record], ClientSession]:
     loop: AbstractEventLoop = get_event_loop()
     session: ClientSession = ClientSession()
 
+    # Independent, so they connect concurrently.
+    graph: StartupGraph = StartupGraph()
+    if settings.STATSD_HOST:
+        metrics.configure(settings.STATSD_HOST, settings.STATSD_PORT)
+        graph.add("metrics", metrics.start)
+    graph.add("pool", lambda: RoboLia.setup_pool(dsn=settings.dsn))  # type: ignore
+    graph.add("redis", lambda: RoboLia.setup_redis(url=settings.redis))  # type: ignore
+
     try:
-        pool: Pool[Record] = await RoboLia.setup_pool(dsn=settings.dsn)  # type: ignore
-        redis: Redis = await RoboLia.setup_redis(url=settings.redis)  # type: ignore
+        with profiler.phase("setup"):
+            results: dict[str, Any] = await graph.run()
+        pool: Pool[Record] = results["pool"]
+        redis: Redis = results["redis"]
 
         log.info("PostgreSQL and Redis successfully connected.")
     except Exception as exc:
         raise exc
 
     try:
-        bot: RoboLia = RoboLia(loop=loop, session=session, pool=pool, redis=redis)
+        with profiler.phase("setup.bot"):
+            bot: RoboLia = RoboLia(
+                loop=loop,
+                session=session,
+                pool=pool,
+                redis=redis,
+                resume_store=ResumeStore(redis) if settings.RESUME_ON_START else None,
+            )
         log.info("Successfully created a bot instance.")
     except Exception as exc:
         raise exc
@@ -56,7 +94,94 @@ async def main() -> None:
         except Exception as exc:
             log.exception("Failed to start the bot.", exc_info=exc)
 
+    await metrics.close()
+
+
+async def run_shards(shard_ids: list[int], shard_count: int) -> None:
+    """Runs one RoboLia per shard in this process, sharing its connections."""
+    setup_logging(settings.LOG_LEVEL)
+
+    loop: AbstractEventLoop = get_event_loop()
+    session: ClientSession = ClientSession()
+    if settings.STATSD_HOST:
+        metrics.configure(settings.STATSD_HOST, settings.STATSD_PORT, tags=(f"shards:{shard_ids[0]}-{shard_ids[-1]}",))
+        await metrics.start()
+
+    pool, redis = await gather(
+        RoboLia.setup_pool(dsn=settings.dsn),  # type: ignore
+        RoboLia.setup_redis(url=settings.redis),  # type: ignore
+    )
+
+    # One set of executors, buffers and subscriptions per worker, not per shard. The
+    # cpu lane's processes are split between the workers instead of each taking every core.
+    cores: int = os.cpu_count() or 1
+    resources: SharedResources = SharedResources(
+        session,
+        pool,
+        redis,
+        executors=ExecutorLanes(
+            cpu=LaneConfig(workers=max(cores // settings.CLUSTER_PROCESSES, 1), max_pending=64, processes=True)
+        ),
+    )
+
+    limiter: IdentifyLimiter = IdentifyLimiter(redis, max_concurrency=settings.IDENTIFY_CONCURRENCY)
+    health: ClusterHealth = ClusterHealth(redis)
+    bots: list[RoboLia] = [
+        RoboLia(
+            loop=loop,
+            session=session,
+            pool=pool,
+            redis=redis,
+            shard_id=shard_id,
+            shard_count=shard_count,
+            identify_limiter=limiter,
+            owns_resources=False,
+            resume_store=ResumeStore(redis) if settings.RESUME_ON_START else None,
+            resources=resources,
+        )
+        for shard_id in shard_ids
+    ]
+    for bot in bots:
+        health.track(bot)
+
+    try:
+        await resources.migrate(bots[0].get_schemas())
+    except Exception as exc:
+        log.exception("Failed to apply schemas", exc_info=exc)
+    await resources.start()
+
+    async def start(bot: RoboLia) -> None:
+        async with bot:
+            try:
+                await bot.start(settings.TOKEN)
+            except Exception as exc:
+                log.exception("Shard ID %s failed to start.", bot.shard_id, exc_info=exc)
+
+    await health.start()
+    try:
+        await gather(*(start(bot) for bot in bots))
+    finally:
+        await health.close()
+        await resources.close()
+        await gather(session.close(), pool.close(), redis.close())
+        await metrics.close()
+
+
+async def cluster() -> None:
+    setup_logging(settings.LOG_LEVEL)
+
+    redis: Redis = await RoboLia.setup_redis(url=settings.redis)  # type: ignore
+    try:
+        await Cluster(
+            run_shards,
+            shard_count=settings.SHARD_COUNT,  # type: ignore
+            processes=settings.CLUSTER_PROCESSES,
+            health=ClusterHealth(redis),
+        ).run()
+    finally:
+        await redis.close()
+
 
 if __name__ == "__main__":
     with suppress(KeyboardInterrupt, CancelledError, capture=False):
-        run(main())
+        run(cluster() if settings.SHARD_COUNT else main())
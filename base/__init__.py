@@ -1,4 +1,48 @@
+from importlib import import_module
+from typing import Any
+
+from .avatars import *
+from .batching import *
+from .buffer import *
+from .cluster import *
+from .codecs import *
 from .config import *
 from .embed import *
+from .executors import *
+from .fetcher import *
+from .filters import *
+from .guilds import *
 from .manager import *
-from .match import *
+from .members import *
+from .memory import *
+from .metrics import *
+from .migrations import *
+from .prefix import *
+from .presence import *
+from .queries import *
+from .resources import *
+from .resume import *
+
+# Modules pulling in pandas or Pillow, imported on first access of one of their names.
+_LAZY: dict[str, str] = {
+    "BaseMatch": ".match",
+    "NGramMatch": ".match",
+    "Card": ".render",
+    "CardRenderer": ".render",
+    "render_card": ".render",
+}
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module: str = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value: Any = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY})
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Optional
+
+from .manager import PostgreSQLManager
+from .queries import Query, queries
+
+if TYPE_CHECKING:
+    from asyncpg import Pool, Record
+
+__all__: tuple[str, ...] = ("AvatarStore",)
+
+
+log: Logger = getLogger(__name__)
+
+BLOB_EXISTS: Query = queries.register("avatar_blob_exists", "SELECT EXISTS(SELECT 1 FROM avatar_blobs WHERE hash = $1)")
+INSERT_BLOB: Query = queries.register(
+    "insert_avatar_blob",
+    "INSERT INTO avatar_blobs (hash, format, size, avatar) VALUES ($1, $2, $3, $4) ON CONFLICT (hash) DO NOTHING",
+)
+INSERT_HISTORY: Query = queries.register("insert_avatar_history_item", "SELECT insert_avatar_history_item($1, $2)")
+GET_BLOB: Query = queries.register("get_avatar_blob", "SELECT format, avatar FROM avatar_blobs WHERE hash = $1")
+GET_SOURCE: Query = queries.register("get_avatar_source", "SELECT avatar_hash FROM avatar_sources WHERE source = $1")
+INSERT_SOURCE: Query = queries.register(
+    "insert_avatar_source",
+    "INSERT INTO avatar_sources (source, avatar_hash) VALUES ($1, $2) ON CONFLICT (source) DO NOTHING",
+)
+
+
+class AvatarStore:
+    """A content-addressed store for avatar images.
+
+    Blobs are keyed by their SHA-256, computed client side, and written at most once.
+    Hashes known to be stored are remembered, so a repeated avatar costs a 32 byte
+    history insert and its bytes are never sent again. Blobs can also be looked up by
+    their ``source``, the place they were downloaded from, to skip the download itself.
+
+    Parameters
+    ----------
+    pool : `Pool`
+        The pool to store avatars with.
+    remember : `int`
+        How many stored hashes to keep in memory.
+    """
+
+    __slots__: tuple[str, ...] = ("manager", "remember", "_known", "_sources")
+
+    def __init__(self, pool: Pool[Record], *, remember: int = 100_000) -> None:
+        self.manager: PostgreSQLManager = PostgreSQLManager(pool)
+        self.remember: int = remember
+        self._known: OrderedDict[bytes, None] = OrderedDict()
+        self._sources: OrderedDict[str, bytes] = OrderedDict()
+
+    @staticmethod
+    def digest(data: bytes) -> bytes:
+        return hashlib.sha256(data).digest()
+
+    def _remember(self, digest: bytes) -> None:
+        self._known[digest] = None
+        self._known.move_to_end(digest)
+        if len(self._known) > self.remember:
+            self._known.popitem(last=False)
+
+    async def contains(self, digest: bytes) -> bool:
+        if digest in self._known:
+            self._known.move_to_end(digest)
+            return True
+
+        record: Optional[Record] = await self.manager.fetchone(BLOB_EXISTS, digest)
+        if record is not None and record[0]:
+            self._remember(digest)
+            return True
+        return False
+
+    def _remember_source(self, source: str, digest: bytes) -> None:
+        self._sources[source] = digest
+        self._sources.move_to_end(source)
+        if len(self._sources) > self.remember:
+            self._sources.popitem(last=False)
+
+    async def lookup(self, source: str) -> Optional[bytes]:
+        """Returns the hash of the blob downloaded from ``source``, if there is one."""
+        digest: Optional[bytes] = self._sources.get(source)
+        if digest is not None:
+            self._sources.move_to_end(source)
+            return digest
+
+        record: Optional[Record] = await self.manager.fetchone(GET_SOURCE, source)
+        if record is None:
+            return None
+
+        self._remember_source(source, record[0])
+        return record[0]
+
+    async def record(self, user_id: int, digest: bytes) -> None:
+        """Records the already stored ``digest`` as the latest avatar of ``user_id``."""
+        await self.manager.execute(INSERT_HISTORY, user_id, digest)
+
+    async def store(
+        self, user_id: int, data: bytes, format: str, *, source: Optional[str] = None, digest: Optional[bytes] = None
+    ) -> bytes:
+        """Stores ``data`` as the latest avatar of ``user_id`` and returns its hash.
+
+        ``digest`` is the hash of ``data`` if the caller already has it, it is not checked.
+        """
+        digest = digest or self.digest(data)
+        if not await self.contains(digest):
+            await self.manager.execute(INSERT_BLOB, digest, format, len(data), data)
+            self._remember(digest)
+
+        if source is not None:
+            await self.manager.execute(INSERT_SOURCE, source, digest)
+            self._remember_source(source, digest)
+
+        await self.record(user_id, digest)
+        return digest
+
+    async def get(self, digest: bytes) -> Optional[tuple[str, bytes]]:
+        record: Optional[Record] = await self.manager.fetchone(GET_BLOB, digest)
+        if record is None:
+            return None
+        return record["format"], record["avatar"]
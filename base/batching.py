@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Optional
+
+import attr
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+__all__: tuple[str, ...] = ("RedisBatcher", "BatchStats")
+
+
+log: Logger = getLogger(__name__)
+
+_Pending = tuple[tuple[Any, ...], dict[str, Any], "asyncio.Future[Any]"]
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class BatchStats:
+    batches: int = attr.ib(default=0)
+    commands: int = attr.ib(default=0)
+    failures: int = attr.ib(default=0)
+    largest: int = attr.ib(default=0)
+    round_trip: float = attr.ib(default=0.0)
+    sizes: Counter[int] = attr.ib(factory=Counter)
+
+    @property
+    def average_size(self) -> float:
+        return self.commands / self.batches if self.batches else 0.0
+
+    @property
+    def average_round_trip(self) -> float:
+        return self.round_trip / self.batches if self.batches else 0.0
+
+
+class RedisBatcher:
+    """Merges Redis commands issued close together into a single pipeline.
+
+    Commands issued in the same event-loop tick (or within ``flush_interval``
+    seconds) are sent as one non-transactional pipeline, each caller still awaits
+    its own result or exception. A batch is sent early once it holds ``max_batch``
+    commands.
+
+    Example
+    -------
+    >>> batcher = RedisBatcher(bot.redis)
+    >>> hits, _ = await asyncio.gather(batcher.incr("hits"), batcher.expire("hits", 60))
+    """
+
+    def __init__(self, redis: Redis, *, max_batch: int = 128, flush_interval: float = 0.0) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be a positive integer.")
+
+        self.redis: Redis = redis
+        self.max_batch: int = max_batch
+        self.flush_interval: float = flush_interval
+        self.stats: BatchStats = BatchStats()
+
+        self._pending: list[_Pending] = []
+        self._handle: Optional[asyncio.Handle] = None
+        self._inflight: set[asyncio.Task[None]] = set()
+
+    def execute_command(self, *args: Any, **options: Any) -> asyncio.Future[Any]:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future[Any] = loop.create_future()
+        self._pending.append((args, options, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._handle is None:
+            if self.flush_interval > 0:
+                self._handle = loop.call_later(self.flush_interval, self._flush)
+            else:
+                self._handle = loop.call_soon(self._flush)
+
+        return future
+
+    def _flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task: asyncio.Task[None] = asyncio.create_task(self._send(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: list[_Pending]) -> None:
+        size: int = len(batch)
+        start: float = time.perf_counter()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for args, options, _ in batch:
+                    pipe.execute_command(*args, **options)
+                results: list[Any] = await pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            self.stats.failures += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        except BaseException:
+            # Cancelled, on shutdown for instance. Nobody else is going to resolve them.
+            self.stats.failures += 1
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        finally:
+            elapsed: float = time.perf_counter() - start
+            metrics.timing("redis.round_trip", elapsed * 1000)
+            metrics.histogram("redis.batch_size", size)
+            self.stats.round_trip += elapsed
+            self.stats.batches += 1
+            self.stats.commands += size
+            self.stats.largest = max(self.stats.largest, size)
+            self.stats.sizes[size] += 1
+
+        for (_, _, future), result in zip(batch, results):
+            # The caller may have been cancelled while the batch was in flight.
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def get(self, name: str) -> asyncio.Future[Any]:
+        return self.execute_command("GET", name)
+
+    def set(self, name: str, value: Any, *, ex: Optional[int] = None) -> asyncio.Future[Any]:
+        if ex is None:
+            return self.execute_command("SET", name, value)
+        return self.execute_command("SET", name, value, "EX", ex)
+
+    def delete(self, *names: str) -> asyncio.Future[Any]:
+        return self.execute_command("DEL", *names)
+
+    def exists(self, *names: str) -> asyncio.Future[Any]:
+        return self.execute_command("EXISTS", *names)
+
+    def incr(self, name: str, amount: int = 1) -> asyncio.Future[Any]:
+        return self.execute_command("INCRBY", name, amount)
+
+    def expire(self, name: str, seconds: int) -> asyncio.Future[Any]:
+        return self.execute_command("EXPIRE", name, seconds)
+
+    def ttl(self, name: str) -> asyncio.Future[Any]:
+        return self.execute_command("TTL", name)
+
+    def hget(self, name: str, key: str) -> asyncio.Future[Any]:
+        return self.execute_command("HGET", name, key)
+
+    def hset(self, name: str, mapping: dict[str, Any]) -> asyncio.Future[Any]:
+        items: list[Any] = [part for pair in mapping.items() for part in pair]
+        return self.execute_command("HSET", name, *items)
+
+    def hgetall(self, name: str) -> asyncio.Future[Any]:
+        return self.execute_command("HGETALL", name)
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import pathlib
+import pickle
+import time
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional, Sequence, TypeVar
+
+import attr
+from asyncpg import InterfaceError, OperatorInterventionError, PostgresConnectionError, PostgresError
+
+if TYPE_CHECKING:
+    from asyncpg import Pool, Record
+
+    from .executors import ExecutorLane
+
+__all__: tuple[str, ...] = ("WriteBehindBuffer",)
+
+
+log: Logger = getLogger(__name__)
+
+_T = TypeVar("_T")
+
+# Errors that mean "Postgres is not reachable right now", the rows are fine and are
+# spilled to disk to be replayed later. Anything else is a problem with the rows.
+UNAVAILABLE: tuple[type[BaseException], ...] = (
+    OSError,
+    asyncio.TimeoutError,
+    InterfaceError,
+    PostgresConnectionError,
+    OperatorInterventionError,
+)
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class BufferedTable:
+    name: str
+    columns: tuple[str, ...]
+    rows: list[tuple[Any, ...]] = attr.ib(factory=list)
+    flushed: int = attr.ib(default=0)
+    spilled: int = attr.ib(default=0)
+
+
+class WriteBehindBuffer:
+    """Collects rows for append-only tables and writes them in bulk with ``COPY``.
+
+    Rows are flushed once a table holds ``max_rows`` of them or every ``interval``
+    seconds, whichever comes first. If Postgres is unavailable the batch is spilled
+    to ``spill_dir`` and replayed after the next successful flush. Producers using
+    `put` wait while more than ``high_water`` rows are pending.
+
+    Spill files are written and read on ``lane``, only the ``COPY`` runs on the event
+    loop. Without one they go through `asyncio.to_thread`.
+
+    Example
+    -------
+    >>> buffer = WriteBehindBuffer(pool)
+    >>> buffer.register("presence_history", ("uid", "status", "changed_at"))
+    >>> await buffer.start()
+    >>> await buffer.put("presence_history", 1, "Online", discord.utils.utcnow())
+    """
+
+    def __init__(
+        self,
+        pool: Pool[Record],
+        *,
+        max_rows: int = 1000,
+        interval: float = 5.0,
+        high_water: int = 50_000,
+        timeout: float = 30.0,
+        spill_dir: str | pathlib.Path = "spill",
+        lane: Optional[ExecutorLane] = None,
+    ) -> None:
+        self.pool: Pool[Record] = pool
+        self.lane: Optional[ExecutorLane] = lane
+        self.max_rows: int = max_rows
+        self.interval: float = interval
+        self.high_water: int = high_water
+        self.timeout: float = timeout
+        self.spill_dir: pathlib.Path = pathlib.Path(spill_dir)
+
+        self.tables: dict[str, BufferedTable] = {}
+
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._wakeup: asyncio.Event = asyncio.Event()
+        self._drained: asyncio.Event = asyncio.Event()
+        self._drained.set()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._has_spill: bool = False
+
+    @property
+    def pending(self) -> int:
+        return sum(len(table.rows) for table in self.tables.values())
+
+    def register(self, table: str, columns: Sequence[str]) -> None:
+        self.tables[table] = BufferedTable(name=table, columns=tuple(columns))
+
+    def put_nowait(self, table: str, *row: Any) -> None:
+        buffered: BufferedTable = self.tables[table]
+        buffered.rows.append(row)
+
+        if len(buffered.rows) >= self.max_rows:
+            self._wakeup.set()
+        if self.pending >= self.high_water:
+            self._drained.clear()
+            self._wakeup.set()
+
+    async def put(self, table: str, *row: Any) -> None:
+        if not self._drained.is_set():
+            await self._drained.wait()
+        self.put_nowait(table, *row)
+
+    async def start(self) -> None:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self._has_spill = any(self.spill_dir.glob("*.pickle"))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="write-behind-buffer")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                log.exception("Unexpected error while flushing the write-behind buffer", exc_info=exc)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            available: bool = True
+            for table in self.tables.values():
+                if not table.rows:
+                    continue
+
+                # Swap the list out first, producers keep appending to a fresh one.
+                rows, table.rows = table.rows, []
+                if available:
+                    available = await self._copy(table.name, table.columns, rows)
+                else:
+                    await self._spill(table.name, table.columns, rows)
+
+                if available:
+                    table.flushed += len(rows)
+                else:
+                    table.spilled += len(rows)
+
+            if available and self._has_spill:
+                await self._replay()
+
+            if self.pending < self.high_water:
+                self._drained.set()
+
+    async def _copy(
+        self, table: str, columns: tuple[str, ...], rows: list[tuple[Any, ...]], *, spill_cancelled: bool = True
+    ) -> bool:
+        """Returns whether Postgres was reachable, spilling ``rows`` to disk if not.
+
+        The rows always end up somewhere: in the table, in a spill file to be replayed
+        or, when Postgres or the encoder refused them, in a ``rejected`` file. Only when
+        cancelled with ``spill_cancelled`` off are they left to the caller.
+        """
+        try:
+            async with self.pool.acquire(timeout=self.timeout) as connection:
+                await connection.copy_records_to_table(table, records=rows, columns=columns, timeout=self.timeout)
+        except (TypeError, ValueError) as exc:
+            # Raised while encoding the rows. asyncpg's own DataError for this is an
+            # InterfaceError, so it has to be caught before UNAVAILABLE.
+            await self._reject(table, columns, rows, exc)
+        except UNAVAILABLE as exc:
+            log.warning("Postgres is unavailable, spilling %s rows for %r to disk: %s", len(rows), table, exc)
+            await self._spill(table, columns, rows)
+            return False
+        except Exception as exc:
+            # A PostgresError, or something unexpected. Replaying these would fail the
+            # same way, keep them aside for inspection.
+            await self._reject(table, columns, rows, exc)
+        except BaseException:
+            # Cancelled mid-copy. The COPY is aborted with the statement, replay the rows later.
+            # Shielded, being cancelled again must not lose them half written.
+            if spill_cancelled:
+                await asyncio.shield(self._spill(table, columns, rows))
+            raise
+
+        return True
+
+    async def _blocking(self, func: Callable[..., _T], *args: Any) -> _T:
+        if self.lane is None:
+            return await asyncio.to_thread(func, *args)
+        return await self.lane.run(func, *args)
+
+    async def _reject(self, table: str, columns: tuple[str, ...], rows: list[tuple[Any, ...]], exc: Exception) -> None:
+        log.exception("Rejected a batch of %s rows for %r", len(rows), table, exc_info=exc)
+        await self._spill(table, columns, rows, suffix="rejected")
+
+    async def _spill(
+        self, table: str, columns: tuple[str, ...], rows: Iterable[tuple[Any, ...]], suffix: str = "pickle"
+    ) -> None:
+        path: pathlib.Path = self.spill_dir / f"{table}.{time.time_ns()}-{os.getpid()}.{suffix}"
+        await self._blocking(self._write, path, (table, columns, list(rows)))
+
+        if suffix == "pickle":
+            self._has_spill = True
+
+    @staticmethod
+    def _write(path: pathlib.Path, payload: tuple[str, tuple[str, ...], list[tuple[Any, ...]]]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as fp:
+            pickle.dump(payload, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _claim(self, path: pathlib.Path) -> Optional[tuple[pathlib.Path, Any]]:
+        # Claim the file before copying, a failed copy spills the rows to a new one.
+        # Renaming is atomic, so buffers of other shards never replay it twice.
+        claimed: pathlib.Path = path.with_name(f"{path.name}.{os.getpid()}-{id(self)}.claimed")
+        try:
+            path.rename(claimed)
+        except FileNotFoundError:
+            return None
+
+        with claimed.open("rb") as fp:
+            return claimed, pickle.load(fp)
+
+    async def _replay(self) -> None:
+        paths: list[pathlib.Path] = await self._blocking(lambda: sorted(self.spill_dir.glob("*.pickle")))
+        for path in paths:
+            entry: Optional[tuple[pathlib.Path, Any]] = await self._blocking(self._claim, path)
+            if entry is None:
+                continue
+
+            claimed, (table, columns, rows) = entry
+            # Only removed once _copy returns, by then the rows are in the table or in a
+            # new spill file. Cancelled or failed in between, the claim is given back instead.
+            try:
+                copied: bool = await self._copy(table, columns, rows, spill_cancelled=False)
+            except BaseException:
+                await asyncio.shield(self._blocking(claimed.rename, path))
+                raise
+
+            await self._blocking(claimed.unlink)
+            if not copied:
+                return
+
+            log.info("Replayed %s spilled rows for %r.", len(rows), table)
+
+        self._has_spill = False
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Optional
+
+import attr
+from redis.exceptions import RedisError
+
+from .codecs import dumps, loads
+
+if TYPE_CHECKING:
+    from multiprocessing.context import SpawnProcess
+
+    import discord
+    from redis.asyncio import Redis
+
+__all__: tuple[str, ...] = ("Cluster", "ClusterHealth", "IdentifyLimiter", "ShardStatus", "partition_shards")
+
+
+log: Logger = getLogger(__name__)
+
+ShardRunner = Callable[[list[int], int], Awaitable[None]]
+
+
+def partition_shards(shard_count: int, processes: int) -> list[list[int]]:
+    """Splits ``range(shard_count)`` into at most ``processes`` contiguous, evenly sized groups."""
+    if shard_count < 1 or processes < 1:
+        raise ValueError("shard_count and processes must be positive integers.")
+
+    processes = min(processes, shard_count)
+    size, extra = divmod(shard_count, processes)
+    groups: list[list[int]] = []
+    start: int = 0
+    for index in range(processes):
+        end: int = start + size + (index < extra)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+class IdentifyLimiter:
+    """Serialises IDENTIFY across every process through Redis.
+
+    Discord allows ``max_concurrency`` identifies per 5 seconds, bucketed by
+    ``shard_id % max_concurrency``. Each bucket is a ``SET NX PX`` key, whoever sets
+    it may identify and the key expiring opens the bucket again.
+
+    Parameters
+    ----------
+    redis : `Redis`
+        The shared Redis connection.
+    max_concurrency : `int`
+        The ``max_concurrency`` of the bot's session start limit.
+    """
+
+    KEY: str = "robolia:identify:{}"
+    WINDOW: int = 5000
+
+    __slots__: tuple[str, ...] = ("redis", "max_concurrency", "poll")
+
+    def __init__(self, redis: Redis, *, max_concurrency: int = 1, poll: float = 0.25) -> None:
+        self.redis: Redis = redis
+        self.max_concurrency: int = max(max_concurrency, 1)
+        self.poll: float = poll
+
+    async def acquire(self, shard_id: Optional[int]) -> None:
+        bucket: int = (shard_id or 0) % self.max_concurrency
+        key: str = self.KEY.format(bucket)
+        token: str = f"{os.getpid()}:{shard_id}"
+
+        while True:
+            try:
+                if await self.redis.set(key, token, nx=True, px=self.WINDOW):
+                    log.debug("Shard ID %s acquired identify bucket %s.", shard_id, bucket)
+                    return
+                remaining: int = await self.redis.pttl(key)
+            except RedisError as exc:
+                # Better to risk a 429 than to never connect at all.
+                log.warning("Identify limiter unavailable, falling back to a local 5s wait: %s", exc)
+                await asyncio.sleep(self.WINDOW / 1000)
+                return
+
+            await asyncio.sleep(max(remaining / 1000, self.poll) if remaining > 0 else self.poll)
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class ShardStatus:
+    shard_id: int
+    pid: int
+    status: str
+    latency: float
+    guilds: int
+    updated: float
+
+    def is_stale(self, max_age: float, *, now: Optional[float] = None) -> bool:
+        return ((now or time.time()) - self.updated) > max_age
+
+    @classmethod
+    def from_bot(cls, bot: discord.Client) -> ShardStatus:
+        if bot.is_closed():
+            status = "closed"
+        elif bot.is_ready():
+            status = "ready"
+        else:
+            status = "connecting"
+
+        latency: float = bot.latency
+        return cls(
+            shard_id=bot.shard_id or 0,
+            pid=os.getpid(),
+            status=status,
+            latency=latency if latency == latency else -1.0,  # NaN before the first heartbeat
+            guilds=len(bot.guilds),
+            updated=time.time(),
+        )
+
+
+class ClusterHealth:
+    """Per-shard health, stored as one JSON field per shard in a Redis hash.
+
+    Every worker reports its own shards, anyone can read the whole cluster back.
+    """
+
+    KEY: str = "robolia:cluster:health"
+
+    def __init__(self, redis: Redis, *, interval: float = 15.0) -> None:
+        self.redis: Redis = redis
+        self.interval: float = interval
+        self._bots: list[discord.Client] = []
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def track(self, bot: discord.Client) -> None:
+        self._bots.append(bot)
+
+    async def report(self) -> None:
+        mapping: dict[str, str] = {}
+        for bot in self._bots:
+            status: ShardStatus = ShardStatus.from_bot(bot)
+            mapping[str(status.shard_id)] = dumps(attr.asdict(status))
+
+        if mapping:
+            await self.redis.hset(self.KEY, mapping=mapping)
+
+    async def snapshot(self) -> dict[int, ShardStatus]:
+        raw: dict[Any, Any] = await self.redis.hgetall(self.KEY)
+        return {int(shard): ShardStatus(**loads(value)) for shard, value in raw.items()}
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="cluster-health")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # A last report, so the supervisor sees a clean shutdown rather than a stale shard.
+        try:
+            await self.report()
+        except RedisError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.report()
+            except RedisError as exc:
+                log.warning("Failed to report shard health: %s", exc)
+            await asyncio.sleep(self.interval)
+
+
+def _bootstrap(runner: ShardRunner, shard_ids: list[int], shard_count: int) -> None:
+    async def main() -> None:
+        task: asyncio.Task[None] = asyncio.current_task()  # type: ignore
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        except NotImplementedError:  # pragma: no cover
+            pass
+
+        await runner(shard_ids, shard_count)
+
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+class Cluster:
+    """Runs ``shard_count`` shards over ``processes`` worker processes.
+
+    Each worker receives its shard ids and runs ``runner(shard_ids, shard_count)``
+    in its own event loop, the supervisor restarts workers that die and logs shards
+    that stop reporting health.
+
+    Parameters
+    ----------
+    runner : `ShardRunner`
+        A module level coroutine function, it must be picklable to reach the workers.
+    shard_count : `int`
+        The total number of shards.
+    processes : `int`
+        How many worker processes to spread the shards over.
+    health : `Optional[ClusterHealth]`
+        Used to watch over the shards, nothing is checked when omitted.
+    """
+
+    def __init__(
+        self,
+        runner: ShardRunner,
+        *,
+        shard_count: int,
+        processes: int,
+        health: Optional[ClusterHealth] = None,
+        restart_delay: float = 5.0,
+    ) -> None:
+        self.runner: ShardRunner = runner
+        self.shard_count: int = shard_count
+        self.groups: list[list[int]] = partition_shards(shard_count, processes)
+        self.health: Optional[ClusterHealth] = health
+        self.restart_delay: float = restart_delay
+
+        # Forking a process that already runs an event loop is asking for trouble.
+        self._context: Any = multiprocessing.get_context("spawn")
+        self._workers: dict[int, SpawnProcess] = {}
+
+    def _spawn(self, index: int) -> None:
+        shard_ids: list[int] = self.groups[index]
+        process: SpawnProcess = self._context.Process(
+            target=_bootstrap,
+            args=(self.runner, shard_ids, self.shard_count),
+            name=f"robolia-cluster-{index}",
+            daemon=False,
+        )
+        process.start()
+        self._workers[index] = process
+        log.info("Started cluster %s (PID %s) with shards %s.", index, process.pid, shard_ids)
+
+    async def run(self) -> None:
+        for index in range(len(self.groups)):
+            self._spawn(index)
+
+        try:
+            await self._supervise()
+        finally:
+            await self.stop()
+
+    async def _supervise(self) -> None:
+        interval: float = self.health.interval if self.health is not None else 15.0
+        last_check: float = time.monotonic()
+        while True:
+            await asyncio.sleep(1.0)
+
+            for index, process in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+
+                log.warning(
+                    "Cluster %s (PID %s) exited with code %s, restarting in %.2fs.",
+                    index,
+                    process.pid,
+                    process.exitcode,
+                    self.restart_delay,
+                )
+                await asyncio.sleep(self.restart_delay)
+                self._spawn(index)
+
+            if self.health is not None and time.monotonic() - last_check >= interval:
+                last_check = time.monotonic()
+                await self._check_health(interval * 3)
+
+    async def _check_health(self, max_age: float) -> None:
+        try:
+            shards: dict[int, ShardStatus] = await self.health.snapshot()  # type: ignore
+        except RedisError as exc:
+            log.warning("Failed to read cluster health: %s", exc)
+            return
+
+        now: float = time.time()
+        for shard_id in range(self.shard_count):
+            status: Optional[ShardStatus] = shards.get(shard_id)
+            if status is None:
+                log.info("Shard ID %s has not reported yet.", shard_id)
+            elif status.is_stale(max_age, now=now):
+                log.warning("Shard ID %s (PID %s) last reported %.0fs ago.", shard_id, status.pid, now - status.updated)
+            elif status.status != "ready":
+                log.info("Shard ID %s is %s.", shard_id, status.status)
+
+    async def stop(self, *, timeout: float = 30.0) -> None:
+        workers: Iterable[SpawnProcess] = list(self._workers.values())
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+
+        for process in workers:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                log.warning("Cluster worker PID %s did not exit in time, killing it.", process.pid)
+                process.kill()
+
+        self._workers.clear()
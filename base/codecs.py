@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from asyncpg import Connection
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+__all__: tuple[str, ...] = ("HAS_ORJSON", "dumps", "dumps_bytes", "loads", "register_json_codecs")
+
+
+log: Logger = getLogger(__name__)
+
+HAS_ORJSON: bool = orjson is not None
+
+# The binary jsonb wire format is a version byte followed by the JSON text.
+JSONB_VERSION: bytes = b"\x01"
+
+
+if orjson is not None:
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    # orjson takes str, bytes and memoryviews, so callers never need to decode first.
+    loads: Callable[[str | bytes | memoryview], Any] = orjson.loads
+
+    def _loads_jsonb(data: bytes) -> Any:
+        return orjson.loads(memoryview(data)[1:])
+
+else:
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=True).encode("utf-8")
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=True)
+
+    def loads(data: str | bytes | memoryview) -> Any:
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+    def _loads_jsonb(data: bytes) -> Any:
+        return json.loads(data[1:])
+
+
+def _dumps_jsonb(obj: Any) -> bytes:
+    return JSONB_VERSION + dumps_bytes(obj)
+
+
+async def register_json_codecs(connection: Connection[Any]) -> None:
+    """Registers binary ``json`` and ``jsonb`` codecs on ``connection``.
+
+    The binary format skips Postgres' text output functions and lets the encoder
+    hand bytes straight to the protocol.
+    """
+    await connection.set_type_codec(
+        "json",
+        encoder=dumps_bytes,
+        decoder=loads,
+        schema="pg_catalog",
+        format="binary",
+    )
+    await connection.set_type_codec(
+        "jsonb",
+        encoder=_dumps_jsonb,
+        decoder=_loads_jsonb,
+        schema="pg_catalog",
+        format="binary",
+    )
@@ -3,13 +3,18 @@ from __future__ import annotations
 import logging
 import sys
 from collections import deque
-from typing import AbstractSet, Any, Generator, Iterator, Optional, Self, Type
+from typing import AbstractSet, Any, Callable, Generator, Iterator, Optional, Self, Type
 
 import coloredlogs
 import discord
+import yarl
+from discord.gateway import KeepAliveHandler, ReconnectWebSocket
 from pydantic import BaseSettings
 from pydantic.fields import ModelField
 
+from .codecs import loads
+from .metrics import metrics
+
 __all__: tuple[str, ...] = ("Settings", "setup_logging", "Gateway")
 
 log: logging.Logger = logging.getLogger(__name__)
@@ -38,6 +43,19 @@ class Settings(BaseSettings):
 
     LOG_LEVEL: str = "INFO"
 
+    # Clustering, a SHARD_COUNT switches the bot into clustered mode.
+    SHARD_COUNT: Optional[int] = None
+    CLUSTER_PROCESSES: int = 1
+    IDENTIFY_CONCURRENCY: int = 1
+
+    # DogStatsD agent to send metrics to, nothing is sent without a host.
+    STATSD_HOST: Optional[str] = None
+    STATSD_PORT: int = 8125
+
+    # RESUME the previous process' gateway sessions on startup. The member and guild
+    # caches start empty then, as Discord only replays the events that were missed.
+    RESUME_ON_START: bool = False
+
     @property
     def guild(self) -> discord.abc.Snowflake:
         return discord.Object(id=self.DEBUG_GUILD)
@@ -101,6 +119,15 @@ class Settings(BaseSettings):
 
 
 class Gateway(discord.gateway.DiscordWebSocket):  # type: ignore
+    # Decides which dispatches reach discord.py's parsers, see `GatewayFilter`.
+    event_filter: Optional[Callable[[str, Any], bool]] = None
+
+    @classmethod
+    async def from_client(cls, client: discord.Client, **kwargs: Any) -> Self:
+        ws: Self = await super().from_client(client, **kwargs)
+        ws.event_filter = getattr(client, "gateway_filter", None)
+        return ws
+
     # discord.py doesn't support mobile gateway
     async def identify(self) -> None:
         payload: dict[str, Any] = {
@@ -139,6 +166,125 @@ class Gateway(discord.gateway.DiscordWebSocket):  # type: ignore
         await self.send_as_json(payload)
         log.info("Shard ID %s has sent the IDENTIFY payload.", self.shard_id)
 
+    # Mirrors discord.py 2.2's implementation, but hands the decompressed bytes
+    # straight to orjson instead of decoding them to a str first.
+    async def received_message(self, msg: Any, /) -> None:
+        if type(msg) is bytes:
+            self._buffer.extend(msg)
+
+            if len(msg) < 4 or msg[-4:] != b"\x00\x00\xff\xff":
+                return
+            msg = self._zlib.decompress(self._buffer)
+            self._buffer = bytearray()
+
+        if "log_receive" in self.__dict__:
+            # Only set when debug events are enabled, which expect text.
+            self.log_receive(msg.decode("utf-8") if type(msg) is bytes else msg)
+        msg = loads(msg)
+
+        log.debug("For Shard ID %s: WebSocket Event: %s", self.shard_id, msg)
+        event: Optional[str] = msg.get("t")
+        if event:
+            self._dispatch("socket_event_type", event)
+            if metrics.enabled:
+                metrics.increment("gateway.events", tags=(f"event:{event}",))
+
+        op: Optional[int] = msg.get("op")
+        data: Any = msg.get("d")
+        seq: Optional[int] = msg.get("s")
+        if seq is not None:
+            self.sequence = seq
+
+        if self._keep_alive:
+            self._keep_alive.tick()
+
+        if op != self.DISPATCH:
+            if op == self.RECONNECT:
+                log.debug("Received RECONNECT opcode.")
+                await self.close()
+                raise ReconnectWebSocket(self.shard_id)
+
+            if op == self.HEARTBEAT_ACK:
+                if self._keep_alive:
+                    self._keep_alive.ack()
+                return
+
+            if op == self.HEARTBEAT:
+                if self._keep_alive:
+                    beat: dict[str, Any] = self._keep_alive.get_payload()
+                    await self.send_as_json(beat)
+                return
+
+            if op == self.HELLO:
+                interval: float = data["heartbeat_interval"] / 1000.0
+                self._keep_alive = KeepAliveHandler(ws=self, interval=interval, shard_id=self.shard_id)
+                # send a heartbeat immediately
+                await self.send_as_json(self._keep_alive.get_payload())
+                self._keep_alive.start()
+                return
+
+            if op == self.INVALIDATE_SESSION:
+                if data is True:
+                    await self.close()
+                    raise ReconnectWebSocket(self.shard_id)
+
+                self.sequence = None
+                self.session_id = None
+                self.gateway = self.DEFAULT_GATEWAY
+                log.info("Shard ID %s session has been invalidated.", self.shard_id)
+                await self.close(code=1000)
+                raise ReconnectWebSocket(self.shard_id, resume=False)
+
+            log.warning("Unknown OP code %s.", op)
+            return
+
+        # Dropped after the sequence was recorded, so RESUME still replays from the right spot.
+        if self.event_filter is not None and event not in ("READY", "RESUMED") and not self.event_filter(event, data):
+            return
+
+        if event == "READY":
+            self.sequence = msg["s"]
+            self.session_id = data["session_id"]
+            self.gateway = yarl.URL(data["resume_gateway_url"])
+            log.info("Shard ID %s has connected to Gateway (Session ID: %s).", self.shard_id, self.session_id)
+
+        elif event == "RESUMED":
+            # pass back the shard ID to the resumed handler
+            data["__shard_id__"] = self.shard_id
+            log.info("Shard ID %s has successfully RESUMED session %s.", self.shard_id, self.session_id)
+
+        try:
+            func: Any = self._discord_parsers[event]
+        except KeyError:
+            log.debug("Unknown event %s.", event)
+        else:
+            func(data)
+
+        # remove the dispatched listeners
+        removed: list[int] = []
+        for index, entry in enumerate(self._dispatch_listeners):
+            if entry.event != event:
+                continue
+
+            future: Any = entry.future
+            if future.cancelled():
+                removed.append(index)
+                continue
+
+            try:
+                valid: bool = entry.predicate(data)
+            except Exception as exc:
+                future.set_exception(exc)
+                removed.append(index)
+            else:
+                if valid:
+                    ret: Any = data if entry.result is None else entry.result(data)
+                    future.set_result(ret)
+                    removed.append(index)
+
+        for index in reversed(removed):
+            del self._dispatch_listeners[index]
+
 
 def setup_logging(level: int | str) -> None:
     """Call this before doing anything else"""
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from logging import Logger, getLogger
+from typing import Any, Callable, Literal, Optional, ParamSpec, TypeVar
+
+import attr
+
+from .metrics import metrics
+
+__all__: tuple[str, ...] = ("ExecutorLane", "ExecutorLanes", "LaneConfig", "LaneStats")
+
+
+log: Logger = getLogger(__name__)
+
+_T = TypeVar("_T")
+_P = ParamSpec("_P")
+
+LaneName = Literal["io", "cpu", "blocking"]
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class LaneConfig:
+    workers: int
+    # Running plus queued calls, callers past this wait before their call is even queued.
+    max_pending: int
+    processes: bool = attr.ib(default=False)
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class LaneStats:
+    submitted: int = attr.ib(default=0)
+    completed: int = attr.ib(default=0)
+    failed: int = attr.ib(default=0)
+    max_depth: int = attr.ib(default=0)
+    wait_time: float = attr.ib(default=0.0)
+
+    @property
+    def average_wait(self) -> float:
+        return self.wait_time / self.submitted if self.submitted else 0.0
+
+
+def _stamped(func: Callable[..., _T], *args: Any, **kwargs: Any) -> tuple[float, _T]:
+    # Runs in the worker, the timestamp tells how long the call sat in the executor's queue.
+    # monotonic is a system-wide clock, comparable across worker processes unlike perf_counter.
+    return time.monotonic(), func(*args, **kwargs)
+
+
+class ExecutorLane:
+    """A named executor with a bounded number of pending calls.
+
+    Parameters
+    ----------
+    name : `str`
+        Used for logging and as the ``lane`` metric tag.
+    config : `LaneConfig`
+        The number of workers, the pending bound and the kind of pool.
+    """
+
+    def __init__(self, name: str, config: LaneConfig) -> None:
+        self.name: str = name
+        self.config: LaneConfig = config
+        self.stats: LaneStats = LaneStats()
+
+        self._executor: Optional[Executor] = None
+        self._slots: asyncio.Semaphore = asyncio.Semaphore(config.max_pending)
+        self._pending: set[asyncio.Future[Any]] = set()
+        self._closed: bool = False
+        self._tags: tuple[str, ...] = (f"lane:{name}",)
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def _get_executor(self) -> Executor:
+        # Created on first use, a process pool nobody needs is a lot of idle memory.
+        if self._executor is None:
+            if self.config.processes:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.config.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.config.workers, thread_name_prefix=f"robolia-{self.name}"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[_P, _T], *args: _P.args, **kwargs: _P.kwargs) -> _T:
+        if self._closed:
+            raise RuntimeError(f"The {self.name!r} executor lane is closed.")
+
+        submitted: float = time.monotonic()
+        await self._slots.acquire()
+        try:
+            loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+            if self.config.processes:
+                call: Callable[[], tuple[float, _T]] = functools.partial(_stamped, func, *args, **kwargs)
+            else:
+                # Same as asyncio.to_thread, the call sees the caller's context variables.
+                context: contextvars.Context = contextvars.copy_context()
+                call = functools.partial(context.run, _stamped, func, *args, **kwargs)
+
+            future: asyncio.Future[tuple[float, _T]] = loop.run_in_executor(self._get_executor(), call)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # The slot is held until the call finishes, even if the caller stops waiting.
+        self._pending.add(future)
+        future.add_done_callback(self._done)
+        self.stats.submitted += 1
+        self.stats.max_depth = max(self.stats.max_depth, self.depth)
+        metrics.gauge("executor.depth", self.depth, tags=self._tags)
+
+        # Shielded, a cancelled caller cannot stop a call that is already running.
+        started, result = await asyncio.shield(future)
+
+        finished: float = time.monotonic()
+        # Slots, the executor's queue and for processes pickling the call all count as waiting.
+        waited: float = max(started - submitted, 0.0)
+        self.stats.completed += 1
+        self.stats.wait_time += waited
+        metrics.timing("executor.wait", waited * 1000, tags=self._tags)
+        metrics.timing("executor.run", (finished - submitted - waited) * 1000, tags=self._tags)
+        return result
+
+    def _done(self, future: asyncio.Future[Any]) -> None:
+        self._pending.discard(future)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            self.stats.failed += 1
+
+    async def close(self, *, timeout: Optional[float] = 30.0) -> None:
+        """Stops accepting calls, waits up to ``timeout`` for pending ones and shuts down."""
+        self._closed = True
+        if self._pending:
+            log.info("Draining %s pending calls from the %r lane.", self.depth, self.name)
+            _, pending = await asyncio.wait(self._pending, timeout=timeout)
+            if pending:
+                log.warning("Abandoning %s calls still running on the %r lane.", len(pending), self.name)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ExecutorLanes:
+    """The executors RoboLia offloads work to.
+
+    - ``io``: threads, for short blocking calls such as file access.
+    - ``cpu``: processes, for CPU-bound work (Pillow, pandas) that would hold the GIL.
+    - ``blocking``: a few threads for long blocking calls, so they cannot starve ``io``.
+
+    Example
+    -------
+    >>> lanes = ExecutorLanes()
+    >>> image = await lanes.cpu.run(render, payload)
+    """
+
+    def __init__(
+        self,
+        *,
+        io: Optional[LaneConfig] = None,
+        cpu: Optional[LaneConfig] = None,
+        blocking: Optional[LaneConfig] = None,
+    ) -> None:
+        cores: int = os.cpu_count() or 1
+        self.io: ExecutorLane = ExecutorLane("io", io or LaneConfig(workers=min(32, cores + 4), max_pending=256))
+        self.cpu: ExecutorLane = ExecutorLane(
+            "cpu", cpu or LaneConfig(workers=max(cores - 1, 1), max_pending=64, processes=True)
+        )
+        self.blocking: ExecutorLane = ExecutorLane("blocking", blocking or LaneConfig(workers=4, max_pending=32))
+
+    def __getitem__(self, name: LaneName) -> ExecutorLane:
+        return getattr(self, name)
+
+    def __iter__(self) -> Any:
+        return iter((self.io, self.cpu, self.blocking))
+
+    async def close(self, *, timeout: Optional[float] = 30.0) -> None:
+        await asyncio.gather(*(lane.close(timeout=timeout) for lane in self))
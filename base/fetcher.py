@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import attr
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    import discord
+    from aiohttp import ClientResponse, ClientSession
+
+    from .avatars import AvatarStore
+    from .executors import ExecutorLane
+
+__all__: tuple[str, ...] = ("AvatarFetcher", "FetchStats", "UnsupportedAvatar")
+
+
+log: Logger = getLogger(__name__)
+
+_T = TypeVar("_T")
+
+# libmagic recognises every image format Discord serves from far less than this.
+SNIFF_BYTES: int = 2048
+# Hashing less than this takes less than handing it to a thread does.
+HASH_INLINE_BYTES: int = 64 * 1024
+
+
+class UnsupportedAvatar(ValueError):
+    """The response was too large or not an image."""
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class FetchStats:
+    downloads: int = attr.ib(default=0)
+    skipped: int = attr.ib(default=0)
+    deduplicated: int = attr.ib(default=0)
+    failures: int = attr.ib(default=0)
+    bytes: int = attr.ib(default=0)
+
+
+class AvatarFetcher:
+    """Downloads avatars into an `AvatarStore`.
+
+    - Avatars whose ``source`` is already stored are not downloaded again.
+    - Concurrent fetches of the same ``source`` share one download.
+    - At most ``per_host`` downloads run against any one host.
+    - Bodies are streamed into buffers reused across downloads, the format is sniffed
+      with libmagic from the first bytes and anything that is not an image is cut off.
+    - Sniffing, and hashing bodies of ``HASH_INLINE_BYTES`` or more, runs on ``lane``.
+
+    Parameters
+    ----------
+    session : `ClientSession`
+        The shared HTTP session.
+    store : `AvatarStore`
+        Where the avatars end up.
+    per_host : `int`
+        How many downloads may run against a single host at once.
+    max_size : `int`
+        The largest accepted body, in bytes.
+    lane : `Optional[ExecutorLane]`
+        Where to sniff and hash, normally the ``io`` lane. Without one both run inline.
+
+    Example
+    -------
+    >>> digest = await fetcher.fetch(user.id, url, source=f"{user.id}/{user.avatar.key}")
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        store: AvatarStore,
+        *,
+        per_host: int = 8,
+        max_size: int = 10 * 1024 * 1024,
+        spare_buffers: int = 8,
+        lane: Optional[ExecutorLane] = None,
+    ) -> None:
+        self.session: ClientSession = session
+        self.store: AvatarStore = store
+        self.per_host: int = per_host
+        self.max_size: int = max_size
+        self.spare_buffers: int = spare_buffers
+        self.lane: Optional[ExecutorLane] = lane
+        self.stats: FetchStats = FetchStats()
+
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._inflight: dict[str, asyncio.Task[bytes]] = {}
+        self._buffers: list[bytearray] = []
+
+    async def fetch_user(self, user: discord.User | discord.Member) -> Optional[bytes]:
+        """Fetches the custom avatar of ``user``, users on a default avatar are skipped."""
+        if user.avatar is None:
+            return None
+
+        asset: discord.Asset = user.avatar.replace(size=1024)
+        return await self.fetch(user.id, asset.url, source=f"{user.id}/{user.avatar.key}")
+
+    async def fetch(self, user_id: int, url: str, *, source: str) -> bytes:
+        """Stores the avatar at ``url`` as the latest one of ``user_id`` and returns its hash."""
+        digest: Optional[bytes] = await self.store.lookup(source)
+        if digest is not None:
+            self.stats.skipped += 1
+            await self.store.record(user_id, digest)
+            return digest
+
+        task: Optional[asyncio.Task[bytes]] = self._inflight.get(source)
+        if task is None:
+            task = asyncio.create_task(self._fetch(user_id, url, source))
+            self._inflight[source] = task
+            task.add_done_callback(lambda done: self._done(source, done))
+        else:
+            self.stats.deduplicated += 1
+
+        # Shielded, a cancelled caller must not cancel the download the others wait on.
+        return await asyncio.shield(task)
+
+    def _done(self, source: str, task: asyncio.Task[bytes]) -> None:
+        self._inflight.pop(source, None)
+        # Retrieved here, so asyncio does not warn when every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, user_id: int, url: str, source: str) -> bytes:
+        host: str = urlsplit(url).netloc
+        semaphore: asyncio.Semaphore = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+
+        try:
+            async with semaphore:
+                with metrics.timed("avatars.download", tags=(f"host:{host}",)):
+                    async with self.session.get(url) as response:
+                        response.raise_for_status()
+                        data, format = await self._read(response)
+        except Exception:
+            self.stats.failures += 1
+            raise
+
+        self.stats.downloads += 1
+        self.stats.bytes += len(data)
+        if len(data) < HASH_INLINE_BYTES:
+            digest: bytes = self.store.digest(data)
+        else:
+            digest = await self._offload(self.store.digest, data)
+        return await self.store.store(user_id, data, format, source=source, digest=digest)
+
+    async def _offload(self, func: Callable[..., _T], *args: Any) -> _T:
+        if self.lane is None:
+            return func(*args)
+        return await self.lane.run(func, *args)
+
+    async def _read(self, response: ClientResponse) -> tuple[bytes, str]:
+        if response.content_length is not None and response.content_length > self.max_size:
+            raise UnsupportedAvatar(f"{response.url} is {response.content_length} bytes.")
+
+        buffer: bytearray = self._buffers.pop() if self._buffers else bytearray()
+        try:
+            size: int = 0
+            format: Optional[str] = None
+            async for chunk in response.content.iter_any():
+                end: int = size + len(chunk)
+                if end > self.max_size:
+                    raise UnsupportedAvatar(f"{response.url} is larger than {self.max_size} bytes.")
+
+                # Overwrites in place while the buffer is large enough, grows it otherwise.
+                buffer[size:end] = chunk
+                size = end
+
+                if format is None and size >= SNIFF_BYTES:
+                    format = await self._offload(self._sniff, buffer, size)
+
+            if size == 0:
+                raise UnsupportedAvatar(f"{response.url} returned an empty body.")
+
+            if format is None:
+                format = await self._offload(self._sniff, buffer, size)
+            with memoryview(buffer) as view:
+                return bytes(view[:size]), format
+        finally:
+            if len(self._buffers) < self.spare_buffers and len(buffer) <= self.max_size:
+                self._buffers.append(buffer)
+
+    @staticmethod
+    def _sniff(buffer: bytearray, size: int) -> str:
+        # Loading libmagic and its database takes a while, no point doing it at startup.
+        import magic
+
+        with memoryview(buffer) as view:
+            mime: str = magic.from_buffer(bytes(view[: min(size, SNIFF_BYTES)]), mime=True)
+
+        kind, _, format = mime.partition("/")
+        if kind != "image":
+            raise UnsupportedAvatar(f"Expected an image, got {mime}.")
+        return format
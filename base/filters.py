@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from collections import Counter
+from logging import Logger, getLogger
+from typing import Any, Callable, Iterable, Optional, Union
+
+import attr
+
+__all__: tuple[str, ...] = ("GatewayFilter", "FilterStats")
+
+
+log: Logger = getLogger(__name__)
+
+RawHandler = Callable[[dict[str, Any]], None]
+# Whether a handler keeps the payload from discord.py, or a predicate deciding it per payload.
+Consume = Union[bool, Callable[[dict[str, Any]], bool]]
+
+# Events the ``users`` allowlist applies to, everything else concerns the whole guild.
+USER_EVENTS: frozenset[str] = frozenset({"PRESENCE_UPDATE", "TYPING_START"})
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class FilterStats:
+    passed: Counter[str] = attr.ib(factory=Counter)
+    dropped: Counter[str] = attr.ib(factory=Counter)
+    consumed: Counter[str] = attr.ib(factory=Counter)
+
+    @property
+    def total(self) -> int:
+        return sum(self.passed.values()) + sum(self.dropped.values()) + sum(self.consumed.values())
+
+
+class GatewayFilter:
+    """Decides, from the raw payload, which dispatches discord.py gets to parse.
+
+    Runs after the sequence is recorded, so dropped events never break RESUME.
+    An event is dropped when its name is in ``drop``, when it belongs to a guild
+    outside ``guilds`` or, for `USER_EVENTS`, to a user outside ``users``. Raw
+    handlers see the payload of every event that is not dropped, a consuming
+    handler keeps it from being parsed into models afterwards. ``consume`` can
+    also be a predicate, to only consume some of the payloads.
+
+    Parameters
+    ----------
+    drop : `Iterable[str]`
+        Event names to drop outright.
+    guilds : `Optional[set[int]]`
+        The guilds to keep events of, `None` keeps every guild.
+    users : `Optional[set[int]]`
+        The users to keep `USER_EVENTS` of, `None` keeps every user. The set is
+        not copied, so it can be updated in place.
+
+    Example
+    -------
+    >>> gateway_filter = GatewayFilter(drop={"TYPING_START"})
+    >>> gateway_filter.add_handler("PRESENCE_UPDATE", tracker.handle, consume=tracker.status_only)
+    """
+
+    __slots__: tuple[str, ...] = ("drop", "guilds", "users", "stats", "_handlers")
+
+    def __init__(
+        self,
+        *,
+        drop: Iterable[str] = (),
+        guilds: Optional[set[int]] = None,
+        users: Optional[set[int]] = None,
+    ) -> None:
+        self.drop: set[str] = set(drop)
+        self.guilds: Optional[set[int]] = guilds
+        self.users: Optional[set[int]] = users
+        self.stats: FilterStats = FilterStats()
+        self._handlers: dict[str, list[tuple[RawHandler, Consume]]] = {}
+
+    def add_handler(self, event: str, handler: RawHandler, *, consume: Consume = False) -> None:
+        self._handlers.setdefault(event, []).append((handler, consume))
+
+    def remove_handler(self, event: str, handler: RawHandler) -> None:
+        handlers: list[tuple[RawHandler, Consume]] = self._handlers.get(event, [])
+        self._handlers[event] = [entry for entry in handlers if entry[0] is not handler]
+
+    def _allowed(self, event: str, data: dict[str, Any]) -> bool:
+        if self.guilds is not None:
+            guild_id: Optional[str] = data.get("guild_id")
+            if guild_id is not None and int(guild_id) not in self.guilds:
+                return False
+
+        if self.users is not None and event in USER_EVENTS:
+            user: Optional[dict[str, Any]] = data.get("user")
+            user_id: Optional[str] = user["id"] if user is not None else data.get("user_id")
+            if user_id is not None and int(user_id) not in self.users:
+                return False
+
+        return True
+
+    def __call__(self, event: str, data: Any) -> bool:
+        """Returns whether ``event`` should be handed to discord.py's parser."""
+        if event in self.drop or (type(data) is dict and not self._allowed(event, data)):
+            self.stats.dropped[event] += 1
+            return False
+
+        consumed: bool = False
+        for handler, consume in self._handlers.get(event, ()):
+            try:
+                handler(data)
+                consumed = consumed or (consume(data) if callable(consume) else consume)
+            except Exception as exc:
+                log.exception("Raw handler %r failed on %s", handler, event, exc_info=exc)
+
+        if consumed:
+            self.stats.consumed[event] += 1
+            return False
+
+        self.stats.passed[event] += 1
+        return True
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Mapping, Optional
+
+import attr
+from redis.exceptions import RedisError
+
+from utils import AsyncCache, CacheStats
+
+from .manager import PostgreSQLManager
+from .queries import Query, queries
+
+if TYPE_CHECKING:
+    from asyncpg import Pool, Record
+    from redis.asyncio import Redis
+    from redis.asyncio.client import PubSub
+
+__all__: tuple[str, ...] = ("GuildSettings", "GuildSettingsCache")
+
+
+log: Logger = getLogger(__name__)
+
+GET_GUILD: Query = queries.register(
+    "get_guild_settings", "SELECT gid, owo_prefix, owo_counting FROM guilds WHERE gid = $1"
+)
+# NULL leaves a column as it is, or at the table's default for a new guild. Each update
+# only writes the columns it sets, concurrent updates of different ones both stick.
+UPSERT_GUILD: Query = queries.register(
+    "upsert_guild_settings",
+    """
+    INSERT INTO guilds (gid, owo_prefix, owo_counting) VALUES ($1, COALESCE($2::TEXT, 'owo'), COALESCE($3::BOOLEAN, TRUE))
+    ON CONFLICT (gid) DO UPDATE SET
+      owo_prefix = COALESCE($2::TEXT, guilds.owo_prefix),
+      owo_counting = COALESCE($3::BOOLEAN, guilds.owo_counting)
+    RETURNING gid, owo_prefix, owo_counting
+    """,
+)
+
+# Caches the hash only if the guild's version is still the one read before going to
+# Postgres. An update in between bumped it, so the row read may be stale.
+# KEYS: the hash, the version. ARGV: the version read, the TTL, then field/value pairs.
+CACHE_IF_CURRENT: str = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class GuildSettings:
+    """A row of the ``guilds`` table, defaults match the table's."""
+
+    gid: int
+    owo_prefix: str = attr.ib(default="owo")
+    owo_counting: bool = attr.ib(default=True)
+
+    @classmethod
+    def from_record(cls, record: Record) -> GuildSettings:
+        return cls(gid=record["gid"], owo_prefix=record["owo_prefix"], owo_counting=record["owo_counting"])
+
+    @classmethod
+    def from_redis(cls, gid: int, mapping: Mapping[Any, Any]) -> GuildSettings:
+        decoded: dict[str, str] = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in mapping.items()
+        }
+        return cls(gid=gid, owo_prefix=decoded["owo_prefix"], owo_counting=decoded["owo_counting"] == "1")
+
+    def to_redis(self) -> dict[str, str]:
+        return {"owo_prefix": self.owo_prefix, "owo_counting": "1" if self.owo_counting else "0"}
+
+
+class GuildSettingsCache:
+    """A read-through cache for guild settings: process memory, then Redis, then Postgres.
+
+    Updates go to Postgres, bump the guild's version in Redis, drop the Redis hash and
+    are announced over Redis pub/sub, so every process evicts its in-memory copy as
+    soon as the message arrives. A load that read Postgres before the update only
+    caches its row if the version is unchanged, so it cannot put the old row back.
+
+    Parameters
+    ----------
+    pool : `Pool`
+        The pool holding the ``guilds`` table.
+    redis : `Redis`
+        The shared Redis connection.
+    maxsize : `int`
+        How many guilds to keep in process memory.
+    ttl : `float`
+        How long a guild stays in process memory, as a safety net for missed messages.
+    redis_ttl : `int`
+        How long a guild stays in Redis, in seconds.
+    """
+
+    CHANNEL: str = "robolia:guild-settings"
+    KEY: str = "robolia:guild:{}"
+    VERSION_KEY: str = "robolia:guild:{}:version"
+
+    def __init__(
+        self,
+        pool: Pool[Record],
+        redis: Redis,
+        *,
+        maxsize: int = 10_000,
+        ttl: float = 300.0,
+        redis_ttl: int = 3600,
+    ) -> None:
+        self.manager: PostgreSQLManager = PostgreSQLManager(pool)
+        self.redis: Redis = redis
+        self.redis_ttl: int = redis_ttl
+
+        self._local: AsyncCache[int, GuildSettings] = AsyncCache(maxsize=maxsize, ttl=ttl)
+        self._cache_if_current: Any = redis.register_script(CACHE_IF_CURRENT)
+        self._pubsub: Optional[PubSub] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._local.stats
+
+    def get_nowait(self, gid: int) -> Optional[GuildSettings]:
+        return self._local.get_nowait(gid)
+
+    async def get(self, gid: int) -> GuildSettings:
+        return await self._local.get(gid, lambda: self._load(gid))
+
+    async def _load(self, gid: int) -> GuildSettings:
+        key: str = self.KEY.format(gid)
+        version_key: str = self.VERSION_KEY.format(gid)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hgetall(key)
+                pipe.get(version_key)
+                mapping, version = await pipe.execute()
+            if mapping:
+                return GuildSettings.from_redis(gid, mapping)
+        except RedisError as exc:
+            log.warning("Redis is unavailable, reading guild %s from Postgres: %s", gid, exc)
+            return await self._fetch(gid)
+
+        settings: GuildSettings = await self._fetch(gid)
+        fields: list[str] = [part for item in settings.to_redis().items() for part in item]
+        try:
+            await self._cache_if_current(keys=[key, version_key], args=[version or b"0", self.redis_ttl, *fields])
+        except RedisError as exc:
+            log.warning("Failed to cache guild %s in Redis: %s", gid, exc)
+
+        return settings
+
+    async def _fetch(self, gid: int) -> GuildSettings:
+        record: Optional[Record] = await self.manager.fetchone(GET_GUILD, gid)
+        return GuildSettings(gid=gid) if record is None else GuildSettings.from_record(record)
+
+    async def update(
+        self, gid: int, *, owo_prefix: Optional[str] = None, owo_counting: Optional[bool] = None
+    ) -> GuildSettings:
+        record: Optional[Record] = await self.manager.fetchone(
+            UPSERT_GUILD, gid, owo_prefix, owo_counting, strategy=self.manager.strategy
+        )
+        assert record is not None  # RETURNING always yields the row.
+        settings: GuildSettings = GuildSettings.from_record(record)
+
+        self._local.invalidate(gid)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                # Bumped after the commit, a load that started before it cannot cache its row.
+                pipe.incr(self.VERSION_KEY.format(gid))
+                pipe.expire(self.VERSION_KEY.format(gid), self.redis_ttl)
+                pipe.delete(self.KEY.format(gid))
+                pipe.publish(self.CHANNEL, str(gid))
+                await pipe.execute()
+        except RedisError as exc:
+            log.warning("Failed to announce the update of guild %s: %s", gid, exc)
+
+        return settings
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(), name="guild-settings-invalidation")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        while True:
+            self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await self._pubsub.subscribe(self.CHANNEL)
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        self._local.invalidate(int(message["data"]))
+            except RedisError as exc:
+                # Invalidations may have been missed while disconnected, start over cold.
+                log.warning("Lost the guild settings subscription, retrying in 5s: %s", exc)
+                self._local.clear()
+                await asyncio.sleep(5)
+            finally:
+                await self._pubsub.reset()
@@ -2,21 +2,51 @@ from __future__ import annotations
 
 import attr
 from abc import ABC, abstractmethod
+from asyncio import CancelledError
 from collections import defaultdict
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from logging import Logger, getLogger
 from types import TracebackType
-from typing import TYPE_CHECKING, Any, AsyncGenerator, Optional, Sequence, Type
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncContextManager,
+    AsyncGenerator,
+    AsyncIterator,
+    Literal,
+    Optional,
+    Sequence,
+    Type,
+    overload,
+)
 
 from asyncpg import Pool, Record
+from asyncpg.cursor import Cursor
 from asyncpg.pool import PoolConnectionProxy
 from asyncpg.transaction import Transaction
 
-__all__: tuple[str, ...] = ("PostgreSQLManager",)
+from .metrics import Timer, metrics
+from .queries import Query, QueryRegistry, queries
+
+__all__: tuple[str, ...] = (
+    "PostgreSQLManager",
+    "ConnectionStrategy",
+    "DefaultConnectionStrategy",
+    "TaskLocalConnectionStrategy",
+    "AutocommitConnectionStrategy",
+)
 
 
 log: Logger = getLogger(__name__)
 
+_Frame = tuple["PoolConnectionProxy[Record]", Optional[Transaction]]
+
+# One variable shared by every strategy, keyed by strategy. A ContextVar per instance
+# would leak, they are never freed and every context keeps a value for each of them.
+# The mapping is replaced, never mutated, so child tasks cannot touch their parent's.
+_FRAMES: ContextVar[dict[ConnectionStrategy, tuple[_Frame, ...]]] = ContextVar("connection_frames", default={})
+
 
 class ConnectionStrategy(ABC):
     @abstractmethod
@@ -24,7 +54,7 @@ class ConnectionStrategy(ABC):
         pass
 
     @abstractmethod
-    async def release_connection(self) -> None:
+    async def release_connection(self, exc_val: Optional[BaseException] = None) -> None:
         pass
 
 
@@ -41,11 +71,12 @@ class DefaultConnectionStrategy(ConnectionStrategy):
     async def acquire_connection(self) -> PoolConnectionProxy[Record]:
         return await self.__aenter__()
 
-    async def release_connection(self) -> None:
-        await self.__aexit__(None, None, None)
+    async def release_connection(self, exc_val: Optional[BaseException] = None) -> None:
+        await self.__aexit__(type(exc_val) if exc_val else None, exc_val, None)
 
     async def __aenter__(self) -> PoolConnectionProxy[Record]:
-        self._connection = await self.pool.acquire(timeout=self.timeout)
+        with metrics.timed("db.pool_wait"):
+            self._connection = await self.pool.acquire(timeout=self.timeout)
         self._transaction = self._connection.transaction()
         await self._transaction.start()
         return self._connection
@@ -67,59 +98,255 @@ class DefaultConnectionStrategy(ConnectionStrategy):
             await self.pool.release(self._connection)
 
 
+class TaskLocalConnectionStrategy(ConnectionStrategy):
+    """A transactional strategy that is safe to share between coroutines.
+
+    The acquired connection and its transaction live in a `ContextVar`, so each task
+    (and each nested acquire within a task) releases exactly what it acquired.
+    """
+
+    __slots__: tuple[str, ...] = ("pool", "timeout")
+
+    def __init__(self, pool: Pool, timeout: float = 10.0) -> None:
+        self.pool: Pool[Any] = pool
+        self.timeout: float = timeout
+
+    def _get_frames(self) -> tuple[_Frame, ...]:
+        return _FRAMES.get().get(self, ())
+
+    def _set_frames(self, frames: tuple[_Frame, ...]) -> None:
+        current: dict[ConnectionStrategy, tuple[_Frame, ...]] = _FRAMES.get()
+        if frames:
+            _FRAMES.set({**current, self: frames})
+        else:
+            # Dropped once empty, the mapping only ever holds strategies with connections out.
+            _FRAMES.set({strategy: value for strategy, value in current.items() if strategy is not self})
+
+    async def _begin(self, connection: PoolConnectionProxy[Record]) -> Optional[Transaction]:
+        transaction: Transaction = connection.transaction()
+        await transaction.start()
+        return transaction
+
+    async def acquire_connection(self) -> PoolConnectionProxy[Record]:
+        with metrics.timed("db.pool_wait"):
+            connection: PoolConnectionProxy[Record] = await self.pool.acquire(timeout=self.timeout)
+        try:
+            transaction: Optional[Transaction] = await self._begin(connection)
+        except BaseException:
+            await self.pool.release(connection)
+            raise
+
+        self._set_frames(self._get_frames() + ((connection, transaction),))
+        return connection
+
+    async def release_connection(self, exc_val: Optional[BaseException] = None) -> None:
+        frames: tuple[_Frame, ...] = self._get_frames()
+        if not frames:
+            raise RuntimeError("release_connection called without a matching acquire_connection")
+
+        connection, transaction = frames[-1]
+        self._set_frames(frames[:-1])
+
+        try:
+            if transaction is not None:
+                if exc_val is not None:
+                    if not isinstance(exc_val, CancelledError):
+                        log.warning("Rolling back transaction due to exception", exc_info=exc_val)
+                    await transaction.rollback()
+                else:
+                    await transaction.commit()
+        finally:
+            await self.pool.release(connection)
+
+
+class AutocommitConnectionStrategy(TaskLocalConnectionStrategy):
+    """A task-local strategy that skips BEGIN/COMMIT entirely.
+
+    Every statement runs in autocommit mode, which saves two round-trips per call.
+    Meant for single-statement reads where a transaction buys nothing. Nothing is
+    made read only, writes through this strategy commit immediately.
+    """
+
+    __slots__: tuple[str, ...] = ()
+
+    async def _begin(self, connection: PoolConnectionProxy[Record]) -> Optional[Transaction]:
+        return None
+
+
 class BaseManager:
-    __slots__: tuple[str, ...] = ("strategy", "logger")
+    __slots__: tuple[str, ...] = ("strategy", "read_strategy", "registry", "logger")
 
-    def __init__(self, strategy: ConnectionStrategy) -> None:
+    def __init__(
+        self,
+        strategy: ConnectionStrategy,
+        read_strategy: Optional[ConnectionStrategy] = None,
+        registry: QueryRegistry = queries,
+    ) -> None:
         self.strategy: ConnectionStrategy = strategy
+        self.read_strategy: ConnectionStrategy = read_strategy or strategy
+        self.registry: QueryRegistry = registry
+
+    @staticmethod
+    def _timed(query: str | Query) -> Timer:
+        # Ad-hoc SQL is lumped together, a tag per distinct string would never end.
+        name: str = query.name if isinstance(query, Query) else "raw"
+        return metrics.timed("db.query", tags=(f"statement:{name}",))
 
     @asynccontextmanager
-    async def acquire_connection(self) -> AsyncGenerator[PoolConnectionProxy[Record], None]:
-        connection: PoolConnectionProxy[Record] = await self.strategy.acquire_connection()
+    async def acquire_connection(
+        self, strategy: Optional[ConnectionStrategy] = None
+    ) -> AsyncGenerator[PoolConnectionProxy[Record], None]:
+        strategy = strategy or self.strategy
+        connection: PoolConnectionProxy[Record] = await strategy.acquire_connection()
         try:
             yield connection
-        finally:
-            await self.strategy.release_connection()
+        except BaseException as exc:
+            await strategy.release_connection(exc)
+            raise
+        else:
+            await strategy.release_connection()
 
     async def execute(
         self,
-        query: str,
+        query: str | Query,
         *args: Any,
         timeout: Optional[float] = 10.0,
+        strategy: Optional[ConnectionStrategy] = None,
         **kwargs: Any,
     ) -> None:
-        async with self.acquire_connection() as connection:
-            await connection.execute(query, *args, timeout=timeout, **kwargs)
+        async with self.acquire_connection(strategy) as connection:
+            with self._timed(query):
+                if isinstance(query, Query):
+                    await self.registry.run(connection, query, "fetch", *args, timeout=timeout)
+                else:
+                    await connection.execute(query, *args, timeout=timeout, **kwargs)
 
     async def fetch(
         self,
-        query: str,
+        query: str | Query,
         *args: Any,
         timeout: Optional[float] = 10.0,
+        strategy: Optional[ConnectionStrategy] = None,
         **kwargs: Any,
     ) -> list[Record]:
-        async with self.acquire_connection() as connection:
-            return await connection.fetch(query, *args, timeout=timeout, **kwargs)
+        async with self.acquire_connection(strategy or self.read_strategy) as connection:
+            with self._timed(query):
+                if isinstance(query, Query):
+                    return await self.registry.run(connection, query, "fetch", *args, timeout=timeout)
+                return await connection.fetch(query, *args, timeout=timeout, **kwargs)
 
     async def fetchone(
         self,
-        query: str,
+        query: str | Query,
         *args: Any,
         timeout: Optional[float] = 10.0,
+        strategy: Optional[ConnectionStrategy] = None,
         **kwargs: Any,
     ) -> Optional[Record]:
-        async with self.acquire_connection() as connection:
-            return await connection.fetchrow(query, *args, timeout=timeout, **kwargs)
+        async with self.acquire_connection(strategy or self.read_strategy) as connection:
+            with self._timed(query):
+                if isinstance(query, Query):
+                    return await self.registry.run(connection, query, "fetchrow", *args, timeout=timeout)
+                return await connection.fetchrow(query, *args, timeout=timeout, **kwargs)
 
     async def executemany(
         self,
-        query: str,
+        query: str | Query,
         args: Sequence[Any],
         timeout: Optional[float] = 10.0,
+        strategy: Optional[ConnectionStrategy] = None,
         **kwargs: Any,
     ) -> None:
-        async with self.acquire_connection() as connection:
-            await connection.executemany(query, args, timeout=timeout, **kwargs)
+        async with self.acquire_connection(strategy) as connection:
+            with self._timed(query):
+                if isinstance(query, Query):
+                    await self.registry.run(connection, query, "executemany", args, timeout=timeout)
+                else:
+                    await connection.executemany(query, args, timeout=timeout, **kwargs)
+
+    @overload
+    def stream(
+        self,
+        query: str | Query,
+        *args: Any,
+        chunk: int = ...,
+        batches: Literal[False] = ...,
+        timeout: Optional[float] = ...,
+        strategy: Optional[ConnectionStrategy] = ...,
+    ) -> AsyncContextManager[AsyncIterator[Record]]:
+        ...
+
+    @overload
+    def stream(
+        self,
+        query: str | Query,
+        *args: Any,
+        chunk: int = ...,
+        batches: Literal[True],
+        timeout: Optional[float] = ...,
+        strategy: Optional[ConnectionStrategy] = ...,
+    ) -> AsyncContextManager[AsyncIterator[list[Record]]]:
+        ...
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        query: str | Query,
+        *args: Any,
+        chunk: int = 500,
+        batches: bool = False,
+        timeout: Optional[float] = 10.0,
+        strategy: Optional[ConnectionStrategy] = None,
+    ) -> AsyncGenerator[AsyncIterator[Any], None]:
+        """Streams the result of ``query`` from a server-side cursor.
+
+        At most ``chunk`` rows are held in memory at once. The connection is released
+        as soon as the block exits, whether the iterator was exhausted or not, so
+        stopping early (or being cancelled) never pins a pool connection.
+
+        Cursors need a transaction, so ``strategy`` must not be a
+        `AutocommitConnectionStrategy`.
+
+        Example
+        -------
+        >>> async with manager.stream("SELECT * FROM presence_history", chunk=1000) as records:
+        ...     async for record in records:
+        ...         ...
+        """
+        if chunk < 1:
+            raise ValueError("chunk must be a positive integer.")
+
+        strategy = strategy or self.strategy
+        if isinstance(strategy, AutocommitConnectionStrategy):
+            raise TypeError("Server-side cursors cannot be used without a transaction.")
+
+        async with self.acquire_connection(strategy) as connection:
+            cursor: Cursor[Record]
+            if isinstance(query, Query):
+                statement = await self.registry.statement(connection, query)
+                cursor = await statement.cursor(*args, timeout=timeout)
+            else:
+                cursor = await connection.cursor(query, *args, timeout=timeout)
+
+            iterator: AsyncGenerator[Any, None] = self._iterate(cursor, chunk=chunk, batches=batches, timeout=timeout)
+            try:
+                yield iterator
+            finally:
+                await iterator.aclose()
+
+    @staticmethod
+    async def _iterate(
+        cursor: Cursor[Record], *, chunk: int, batches: bool, timeout: Optional[float]
+    ) -> AsyncGenerator[Any, None]:
+        while batch := await cursor.fetch(chunk, timeout=timeout):
+            if batches:
+                yield batch
+            else:
+                for record in batch:
+                    yield record
+
+            if len(batch) < chunk:
+                return
 
     async def reaveal_table(self, table: str) -> dict[str, dict[str, str]]:
         tables: dict[str, dict[str, str]] = defaultdict(dict)
@@ -155,6 +382,9 @@ class PostgreSQLManager(BaseManager):
     >>> async with PostgreSQLManager(pool) as manager:
     ...     await manager.execute("INSERT INTO table (column) VALUES ($1)", 1)
 
+    Writes run inside a transaction, while `fetch` and `fetchone` default to the
+    autocommit ``read_strategy``. Pass ``strategy=`` to override either per call.
+
     Parameters
     ----------
     pool : `Pool`
@@ -173,7 +403,8 @@ class PostgreSQLManager(BaseManager):
         timeout: float = 10.0,
     ) -> None:
         super().__init__(
-            DefaultConnectionStrategy(pool, timeout=timeout),
+            TaskLocalConnectionStrategy(pool, timeout=timeout),
+            AutocommitConnectionStrategy(pool, timeout=timeout),
         )
 
 
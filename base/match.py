@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import List, Literal, Optional
+from typing import List, Literal, Optional, Sequence
 
+import numpy as np
 from pandas import DataFrame
 
-__all__: tuple[str, ...] = ("BaseMatch",)
+__all__: tuple[str, ...] = ("BaseMatch", "NGramMatch")
 
 
 class BaseMatch(ABC):
@@ -16,3 +17,183 @@ class BaseMatch(ABC):
     @abstractmethod
     def match(self, target: str, options: Optional[List[str]] = None, **kwargs) -> DataFrame:
         raise NotImplementedError()
+
+
+class NGramMatch(BaseMatch):
+    """Matches against a character n-gram index built once over the options.
+
+    Fuzzy scores are the Dice coefficient of the n-gram sets, computed for every
+    option in a single `numpy.bincount` over the posting lists of the query's
+    n-grams. Exact and prefix lookups binary search a sorted copy of the options.
+
+    Every mode returns a `DataFrame` with the ``option``, its ``index`` in the
+    options and a ``score`` between 0 and 1, best first.
+
+    Parameters
+    ----------
+    options : `Optional[Sequence[str]]`
+        The options to index, can also be given on the first `match`.
+    mode : `int`
+        One of `EXACT`, `PREFIX` or `FUZZY`.
+    n : `int`
+        The n-gram length.
+    limit : `int`
+        How many matches to return by default.
+
+    Example
+    -------
+    >>> matcher = NGramMatch([command.qualified_name for command in bot.walk_commands()])
+    >>> matcher.match("maintenence backfil", limit=3)
+    """
+
+    EXACT: int = 0
+    PREFIX: int = 1
+    FUZZY: int = 2
+
+    COLUMNS: tuple[str, ...] = ("option", "index", "score")
+
+    def __init__(
+        self,
+        options: Optional[Sequence[str]] = None,
+        *,
+        mode: int = FUZZY,
+        n: int = 3,
+        limit: int = 10,
+    ) -> None:
+        super().__init__(mode)
+        if n < 1:
+            raise ValueError("n must be a positive integer.")
+
+        self.n: int = n
+        self.limit: int = limit
+
+        self._source: Optional[Sequence[str]] = None
+        self._options: np.ndarray = np.empty(0, dtype=object)
+        self._sorted: np.ndarray = np.empty(0, dtype=object)
+        self._order: np.ndarray = np.empty(0, dtype=np.int64)
+        self._grams: dict[str, int] = {}
+        self._offsets: np.ndarray = np.zeros(1, dtype=np.int64)
+        self._postings: np.ndarray = np.empty(0, dtype=np.int32)
+        self._sizes: np.ndarray = np.empty(0, dtype=np.int32)
+        self._lengths: np.ndarray = np.empty(0, dtype=np.float64)
+
+        if options is not None:
+            self.index(options)
+
+    def __len__(self) -> int:
+        return len(self._options)
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        return " ".join(value.casefold().split())
+
+    def ngrams(self, value: str) -> set[str]:
+        # Padded, so short strings still have n-grams and word edges weigh in.
+        padded: str = f"{' ' * (self.n - 1)}{value} "
+        return {padded[i : i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def index(self, options: Sequence[str]) -> None:
+        normalized: list[str] = [self.normalize(option) for option in options]
+
+        grams: dict[str, int] = {}
+        gram_ids: list[int] = []
+        option_ids: list[int] = []
+        sizes: list[int] = []
+        for position, value in enumerate(normalized):
+            unique: set[str] = self.ngrams(value)
+            sizes.append(len(unique))
+            for gram in unique:
+                gram_ids.append(grams.setdefault(gram, len(grams)))
+            option_ids.extend([position] * len(unique))
+
+        # CSR posting lists: the options containing gram g are postings[offsets[g]:offsets[g + 1]].
+        gram_array: np.ndarray = np.asarray(gram_ids, dtype=np.int64)
+        order: np.ndarray = np.argsort(gram_array, kind="stable")
+        self._postings = np.asarray(option_ids, dtype=np.int32)[order]
+        self._offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_array, minlength=len(grams)), out=self._offsets[1:])
+        self._sizes = np.asarray(sizes, dtype=np.int32)
+        self._lengths = np.fromiter((len(value) for value in normalized), dtype=np.float64, count=len(normalized))
+        self._grams = grams
+
+        self._options = np.asarray(list(options), dtype=object)
+        self._order = np.argsort(np.asarray(normalized, dtype=object), kind="stable")
+        self._sorted = np.asarray(normalized, dtype=object)[self._order]
+        self._source = options
+
+    def match(self, target: str, options: Optional[List[str]] = None, **kwargs) -> DataFrame:
+        """Returns the best ``limit`` matches of ``target``.
+
+        Keyword Arguments
+        -----------------
+        limit : `int`
+            Overrides the default limit.
+        mode : `int`
+            Overrides `mode` for this call.
+        threshold : `float`
+            The lowest fuzzy score to return, 0 by default.
+        """
+        if options is not None and options is not self._source:
+            self.index(options)
+
+        limit: int = kwargs.get("limit", self.limit)
+        mode: int = kwargs.get("mode", self.mode)
+        query: str = self.normalize(target)
+
+        if mode == self.EXACT:
+            indices, scores = self._exact(query)
+        elif mode == self.PREFIX:
+            indices, scores = self._prefix(query)
+        elif mode == self.FUZZY:
+            indices, scores = self._fuzzy(query, threshold=kwargs.get("threshold", 0.0))
+        else:
+            raise ValueError(f"Unknown match mode {mode!r}.")
+
+        return self._top(indices, scores, limit)
+
+    def _range(self, low: str, high: str) -> np.ndarray:
+        start: int = int(np.searchsorted(self._sorted, low, side="left"))
+        stop: int = int(np.searchsorted(self._sorted, high, side="right"))
+        return self._order[start:stop]
+
+    def _exact(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        indices: np.ndarray = self._range(query, query)
+        return indices, np.ones(len(indices), dtype=np.float64)
+
+    def _prefix(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        indices: np.ndarray = self._range(query, query + "\U0010ffff")
+        if not len(indices):
+            return indices, np.empty(0, dtype=np.float64)
+
+        # The closer the option is to the query itself, the better the completion.
+        lengths: np.ndarray = self._lengths[indices]
+        return indices, len(query) / np.maximum(lengths, 1.0)
+
+    def _fuzzy(self, query: str, *, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+        grams: set[str] = self.ngrams(query)
+        ids: list[int] = [self._grams[gram] for gram in grams if gram in self._grams]
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        postings: np.ndarray = np.concatenate([self._postings[self._offsets[i] : self._offsets[i + 1]] for i in ids])
+        shared: np.ndarray = np.bincount(postings, minlength=len(self._options))
+        indices: np.ndarray = np.flatnonzero(shared)
+
+        scores: np.ndarray = 2.0 * shared[indices] / (len(grams) + self._sizes[indices])
+        if threshold > 0:
+            keep: np.ndarray = scores >= threshold
+            indices, scores = indices[keep], scores[keep]
+        return indices, scores
+
+    def _top(self, indices: np.ndarray, scores: np.ndarray, limit: int) -> DataFrame:
+        if len(indices) > limit:
+            # O(n) selection of the best `limit`, only those get sorted.
+            best: np.ndarray = np.argpartition(-scores, limit - 1)[:limit]
+            indices, scores = indices[best], scores[best]
+
+        order: np.ndarray = np.lexsort((indices, -scores))
+        indices, scores = indices[order], scores[order]
+        return DataFrame(
+            {"option": self._options[indices], "index": indices, "score": scores},
+            columns=list(self.COLUMNS),
+        )
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import attr
+
+if TYPE_CHECKING:
+    import discord
+
+__all__: tuple[str, ...] = ("CachePolicy", "MemberCache")
+
+
+log: Logger = getLogger(__name__)
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class CachePolicy:
+    """How much of discord.py's state cache RoboLia keeps around.
+
+    Members of tracked users and the bot itself are always kept. Anyone else stays
+    cached while they were active within ``member_idle`` seconds in a guild that was
+    itself active within ``guild_idle`` seconds, at most ``max_members`` of them.
+    Members in a voice channel or authoring a cached message are never evicted.
+    """
+
+    max_messages: int = attr.ib(default=2000)
+    member_idle: float = attr.ib(default=30 * 60.0)
+    guild_idle: float = attr.ib(default=6 * 60 * 60.0)
+    max_members: int = attr.ib(default=50_000)
+    sweep_interval: float = attr.ib(default=5 * 60.0)
+    # Strip presences, and untracked members of idle guilds, from GUILD_CREATE before they are parsed.
+    trim_guilds: bool = attr.ib(default=True)
+
+
+class MemberCache:
+    """Applies a `CachePolicy` to the member cache of ``bot``.
+
+    Activity is fed from raw gateway payloads through `touch`, eviction runs every
+    ``policy.sweep_interval`` seconds.
+
+    Parameters
+    ----------
+    bot : `discord.Client`
+        The client whose guilds are swept.
+    policy : `CachePolicy`
+        The limits to enforce.
+    tracked : `set[int]`
+        The users whose members are always kept, not copied.
+    """
+
+    def __init__(
+        self,
+        bot: discord.Client,
+        policy: CachePolicy,
+        *,
+        tracked: set[int],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.bot: discord.Client = bot
+        self.policy: CachePolicy = policy
+        self.tracked: set[int] = tracked
+        self.evicted: int = 0
+
+        self._clock: Callable[[], float] = clock
+        self._members: OrderedDict[tuple[int, int], float] = OrderedDict()
+        self._guilds: dict[int, float] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def touch(self, guild_id: int, user_id: int) -> None:
+        now: float = self._clock()
+        key: tuple[int, int] = (guild_id, user_id)
+        self._members[key] = now
+        self._members.move_to_end(key)
+        self._guilds[guild_id] = now
+
+        if len(self._members) > self.policy.max_members:
+            self._members.popitem(last=False)
+
+    def on_message(self, data: dict[str, Any]) -> None:
+        guild_id: Optional[str] = data.get("guild_id")
+        if guild_id is not None and "author" in data:
+            self.touch(int(guild_id), int(data["author"]["id"]))
+
+    def on_guild_create(self, data: dict[str, Any]) -> None:
+        if not self.policy.trim_guilds or data.get("unavailable"):
+            return
+
+        # Presences are only ever read from the compact store, never from Member objects.
+        data["presences"] = []
+        # Members of an active guild would only be fetched back, the sweep evicts the idle ones.
+        if self.is_active(int(data["id"])):
+            return
+
+        me: Optional[int] = self.bot.user and self.bot.user.id
+        members: list[dict[str, Any]] = data.get("members", [])
+        data["members"] = [
+            member for member in members if (user_id := int(member["user"]["id"])) == me or user_id in self.tracked
+        ]
+
+    def is_active(self, guild_id: int, *, now: Optional[float] = None) -> bool:
+        seen: Optional[float] = self._guilds.get(guild_id)
+        return seen is not None and (now or self._clock()) - seen <= self.policy.guild_idle
+
+    def _expire(self, now: float) -> None:
+        while self._members:
+            key, seen = next(iter(self._members.items()))
+            if now - seen <= self.policy.member_idle:
+                break
+            del self._members[key]
+
+        for guild_id in [gid for gid, seen in self._guilds.items() if now - seen > self.policy.guild_idle]:
+            del self._guilds[guild_id]
+
+    def _referenced(self) -> set[tuple[int, int]]:
+        # Cached messages hold on to their author, evicting them would leave two copies around.
+        return {
+            (message.guild.id, message.author.id)
+            for message in self.bot.cached_messages
+            if message.guild is not None and message.author is not None
+        }
+
+    async def sweep(self) -> int:
+        now: float = self._clock()
+        self._expire(now)
+        me: Optional[int] = self.bot.user and self.bot.user.id
+        referenced: set[tuple[int, int]] = self._referenced()
+
+        evicted: int = 0
+        for guild in self.bot.guilds:
+            active: bool = self.is_active(guild.id, now=now)
+            stale: list[discord.Member] = [
+                member
+                for member in guild.members
+                if member.id != me
+                and member.id not in self.tracked
+                and not (active and (guild.id, member.id) in self._members)
+                and (guild.id, member.id) not in referenced
+                and member.voice is None
+            ]
+            for member in stale:
+                # What discord.py itself does on GUILD_MEMBER_REMOVE, minus the event.
+                guild._remove_member(member)
+            evicted += len(stale)
+
+            # Large guilds can take a while, let the gateway breathe in between.
+            await asyncio.sleep(0)
+
+        self.evicted += evicted
+        if evicted:
+            log.debug("Evicted %s idle members from the cache.", evicted)
+        return evicted
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="member-cache-sweep")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.policy.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as exc:
+                log.exception("Failed to sweep the member cache", exc_info=exc)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import resource
+import sys
+import types
+from collections import deque
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+import attr
+import discord
+
+if TYPE_CHECKING:
+    from .executors import ExecutorLane
+    from .presence import CompactPresence
+
+__all__: tuple[str, ...] = ("CacheUsage", "MemoryReport", "deep_sizeof")
+
+
+# Shared objects owned elsewhere, counting them would bill every cache for the whole client.
+_STOP: tuple[type, ...] = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.MethodType,
+    types.BuiltinFunctionType,
+    discord.Client,
+    discord.Guild,
+    discord.Role,
+    discord.Emoji,
+    discord.Thread,
+    discord.abc.GuildChannel,
+    discord.abc.PrivateChannel,
+    discord.state.ConnectionState,
+)
+
+
+def _children(obj: Any) -> Iterable[Any]:
+    # Copied in one go, the event loop keeps mutating them while a walk runs in a thread.
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            yield key
+            yield value
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        yield from tuple(obj)
+    else:
+        for cls in type(obj).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                value: Any = getattr(obj, slot, None)
+                if value is not None:
+                    yield value
+        if hasattr(obj, "__dict__"):
+            yield obj.__dict__
+
+
+def deep_sizeof(roots: Iterable[Any], *, seen: Optional[set[int]] = None) -> int:
+    """An estimate of the bytes held by ``roots``, skipping objects already in ``seen``.
+
+    Pass the same ``seen`` set across calls so shared objects are only counted once.
+    """
+    seen = set() if seen is None else seen
+    stack: list[Any] = list(roots)
+    total: int = 0
+    while stack:
+        obj: Any = stack.pop()
+        if id(obj) in seen or isinstance(obj, _STOP):
+            continue
+
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(_children(obj))
+    return total
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class CacheUsage:
+    name: str
+    count: int
+    size: int
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class MemoryReport:
+    caches: tuple[CacheUsage, ...]
+    peak_rss: int
+
+    @property
+    def total(self) -> int:
+        return sum(cache.size for cache in self.caches)
+
+    @classmethod
+    async def collect(
+        cls, bot: discord.Client, presences: dict[int, CompactPresence], *, lane: ExecutorLane
+    ) -> MemoryReport:
+        """Snapshots the caches of ``bot`` on the event loop and walks them on ``lane``.
+
+        ``lane`` has to run threads, normally the ``blocking`` one.
+        """
+        state: Any = bot._connection
+        # Users first: members and messages point at them, they belong to the user cache.
+        users: list[discord.User] = list(state._users.values())
+        members: list[discord.Member] = [member for guild in bot.guilds for member in guild.members]
+        messages: list[discord.Message] = list(state._messages or ())
+        return await lane.run(cls._walk, users, members, messages, presences.copy())
+
+    @classmethod
+    def _walk(
+        cls,
+        users: list[discord.User],
+        members: list[discord.Member],
+        messages: list[discord.Message],
+        presences: dict[int, CompactPresence],
+    ) -> MemoryReport:
+        seen: set[int] = set()
+        caches: tuple[CacheUsage, ...] = (
+            CacheUsage(name="users", count=len(users), size=deep_sizeof(users, seen=seen)),
+            CacheUsage(name="members", count=len(members), size=deep_sizeof(members, seen=seen)),
+            CacheUsage(name="messages", count=len(messages), size=deep_sizeof(messages, seen=seen)),
+            CacheUsage(name="presences", count=len(presences), size=deep_sizeof([presences], seen=seen)),
+        )
+        # ru_maxrss is in kibibytes on Linux.
+        return cls(caches=caches, peak_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+import threading
+import time
+from logging import Logger, getLogger
+from types import TracebackType
+from typing import Iterable, Optional, Type
+
+__all__: tuple[str, ...] = ("StatsD", "Timer", "metrics")
+
+
+log: Logger = getLogger(__name__)
+
+Tags = Iterable[str]
+
+# Keeps every datagram below the usual Ethernet MTU, so nothing is fragmented.
+MAX_PACKET: int = 1432
+
+
+class Timer:
+    """Reports the time spent inside the ``with`` block, in milliseconds."""
+
+    __slots__: tuple[str, ...] = ("client", "name", "tags", "start", "elapsed")
+
+    def __init__(self, client: StatsD, name: str, tags: Optional[Tags] = None) -> None:
+        self.client: StatsD = client
+        self.name: str = name
+        self.tags: Optional[Tags] = tags
+        self.start: float = 0.0
+        self.elapsed: float = 0.0
+
+    def __enter__(self) -> Timer:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.elapsed = (time.perf_counter() - self.start) * 1000
+        self.client.timing(self.name, self.elapsed, tags=self.tags)
+
+
+class StatsD:
+    """A non-blocking DogStatsD client over UDP.
+
+    Counters are summed and gauges keep their last value until the next flush, timings
+    are sent as is. Everything goes out every ``flush_interval`` seconds, packed into as
+    few datagrams as possible. A full socket buffer drops the packet rather than
+    waiting, metrics are never worth stalling the event loop for.
+
+    Until `configure` is called every method is a no-op, which makes the module level
+    `metrics` safe to use unconditionally.
+
+    Example
+    -------
+    >>> metrics.configure("127.0.0.1", 8125, tags=("shard:0",))
+    >>> await metrics.start()
+    >>> with metrics.timed("db.query", tags=("statement:get_guild_settings",)):
+    ...     ...
+    """
+
+    def __init__(self, *, prefix: str = "robolia", flush_interval: float = 1.0) -> None:
+        self.prefix: str = prefix
+        self.flush_interval: float = flush_interval
+        self.enabled: bool = False
+        self.dropped: int = 0
+
+        self._address: Optional[tuple[str, int]] = None
+        self._socket: Optional[socket.socket] = None
+        self._tags: str = ""
+        self._lock: threading.Lock = threading.Lock()
+        self._counters: dict[tuple[str, str], int] = {}
+        self._gauges: dict[tuple[str, str], float] = {}
+        self._lines: list[str] = []
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def configure(self, host: str, port: int = 8125, *, tags: Tags = ()) -> None:
+        self._address = (host, port)
+        self._tags = ",".join(tags)
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self.enabled = True
+        log.info("Sending metrics to %s:%s.", host, port)
+
+    def _key(self, name: str, tags: Optional[Tags]) -> tuple[str, str]:
+        joined: str = ",".join(tags) if tags else ""
+        if self._tags:
+            joined = f"{self._tags},{joined}" if joined else self._tags
+        return f"{self.prefix}.{name}", joined
+
+    def increment(self, name: str, value: int = 1, *, tags: Optional[Tags] = None) -> None:
+        if not self.enabled:
+            return
+
+        key: tuple[str, str] = self._key(name, tags)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, *, tags: Optional[Tags] = None) -> None:
+        if not self.enabled:
+            return
+
+        key: tuple[str, str] = self._key(name, tags)
+        with self._lock:
+            self._gauges[key] = value
+
+    def timing(self, name: str, milliseconds: float, *, tags: Optional[Tags] = None) -> None:
+        if not self.enabled:
+            return
+
+        metric, joined = self._key(name, tags)
+        line: str = f"{metric}:{milliseconds:.3f}|ms" + (f"|#{joined}" if joined else "")
+        with self._lock:
+            self._lines.append(line)
+
+    def histogram(self, name: str, value: float, *, tags: Optional[Tags] = None) -> None:
+        if not self.enabled:
+            return
+
+        metric, joined = self._key(name, tags)
+        line: str = f"{metric}:{value}|h" + (f"|#{joined}" if joined else "")
+        with self._lock:
+            self._lines.append(line)
+
+    def timed(self, name: str, *, tags: Optional[Tags] = None) -> Timer:
+        return Timer(self, name, tags)
+
+    def flush(self) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            gauges, self._gauges = self._gauges, {}
+            lines, self._lines = self._lines, []
+
+        for (metric, joined), count in counters.items():
+            lines.append(f"{metric}:{count}|c" + (f"|#{joined}" if joined else ""))
+        for (metric, joined), value in gauges.items():
+            lines.append(f"{metric}:{value}|g" + (f"|#{joined}" if joined else ""))
+
+        packet: list[str] = []
+        size: int = 0
+        for line in lines:
+            if packet and size + len(line) + 1 > MAX_PACKET:
+                self._send("\n".join(packet))
+                packet, size = [], 0
+            packet.append(line)
+            size += len(line) + 1
+
+        if packet:
+            self._send("\n".join(packet))
+
+    def _send(self, packet: str) -> None:
+        try:
+            self._socket.sendto(packet.encode("utf-8"), self._address)  # type: ignore
+        except (BlockingIOError, InterruptedError):
+            self.dropped += 1
+        except OSError as exc:
+            self.dropped += 1
+            log.debug("Failed to send metrics: %s", exc)
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="statsd-flush")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        self.flush()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        self.enabled = False
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+
+metrics: StatsD = StatsD()
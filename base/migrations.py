@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import hashlib
+import pathlib
+import re
+import time
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import attr
+from asyncpg import UndefinedTableError
+
+if TYPE_CHECKING:
+    from asyncpg import Pool, Record
+
+__all__: tuple[str, ...] = ("Migration", "MigrationResult", "MigrationRunner")
+
+
+log: Logger = getLogger(__name__)
+
+# Any schema file may declare the files it depends on, relative to the schema root:
+# -- requires: prerequisites/user.sql
+REQUIRES: re.Pattern[str] = re.compile(r"^--\s*requires:\s*(?P<names>.+)$", re.MULTILINE | re.IGNORECASE)
+
+# Arbitrary, but constant, so that concurrent processes never migrate at the same time.
+LOCK_KEY: int = 0x524C4941
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class Migration:
+    name: str
+    path: pathlib.Path
+    checksum: str
+    requires: tuple[str, ...] = ()
+
+    def read(self) -> str:
+        return self.path.read_text()
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class MigrationResult:
+    name: str
+    duration: float
+
+
+class MigrationRunner:
+    """Applies schema files whose checksum changed since they were last applied.
+
+    Checksums live in the ``schema_migrations`` table. When nothing changed a restart
+    costs a single ``SELECT`` on it, otherwise every changed file is applied in
+    dependency order inside one transaction, under an advisory lock.
+
+    Parameters
+    ----------
+    pool : `Pool`
+        The pool to run migrations on.
+    root : `pathlib.Path`
+        The directory schema names are made relative to.
+    """
+
+    __slots__: tuple[str, ...] = ("pool", "root")
+
+    def __init__(self, pool: Pool[Record], *, root: str | pathlib.Path = "schemas") -> None:
+        self.pool: Pool[Record] = pool
+        self.root: pathlib.Path = pathlib.Path(root)
+
+    def load(self, paths: Iterable[pathlib.Path]) -> list[Migration]:
+        migrations: list[Migration] = []
+        for path in paths:
+            content: bytes = path.read_bytes()
+            requires: list[str] = []
+            for match in REQUIRES.finditer(content.decode()):
+                requires.extend(name.strip() for name in match["names"].split(",") if name.strip())
+
+            migrations.append(
+                Migration(
+                    name=path.relative_to(self.root).as_posix(),
+                    path=path,
+                    checksum=hashlib.sha256(content).hexdigest(),
+                    requires=tuple(requires),
+                )
+            )
+
+        return self.order(migrations)
+
+    @staticmethod
+    def order(migrations: list[Migration]) -> list[Migration]:
+        """Sorts ``migrations`` so every file comes after the ones it requires.
+
+        Files without constraints between them keep their original order.
+        """
+        by_name: dict[str, Migration] = {migration.name: migration for migration in migrations}
+        for migration in migrations:
+            for name in migration.requires:
+                if name not in by_name:
+                    raise ValueError(f"{migration.name} requires unknown schema {name!r}.")
+
+        ordered: list[Migration] = []
+        done: set[str] = set()
+        visiting: set[str] = set()
+
+        def visit(migration: Migration) -> None:
+            if migration.name in done:
+                return
+            if migration.name in visiting:
+                raise ValueError(f"Circular schema requirement involving {migration.name!r}.")
+
+            visiting.add(migration.name)
+            for name in migration.requires:
+                visit(by_name[name])
+            visiting.discard(migration.name)
+
+            done.add(migration.name)
+            ordered.append(migration)
+
+        for migration in migrations:
+            visit(migration)
+
+        return ordered
+
+    async def applied(self) -> Optional[dict[str, str]]:
+        """Returns the recorded checksums, or `None` if the bookkeeping table is missing."""
+        try:
+            records: list[Record] = await self.pool.fetch("SELECT name, checksum FROM schema_migrations")
+        except UndefinedTableError:
+            return None
+        return {record["name"]: record["checksum"] for record in records}
+
+    async def run(self, paths: Iterable[pathlib.Path]) -> list[MigrationResult]:
+        migrations: list[Migration] = self.load(paths)
+
+        applied: Optional[dict[str, str]] = await self.applied()
+        if applied is not None and all(applied.get(m.name) == m.checksum for m in migrations):
+            log.info("All %s schemas are up to date.", len(migrations))
+            return []
+
+        results: list[MigrationResult] = []
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("SELECT pg_advisory_xact_lock($1)", LOCK_KEY)
+                await connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name TEXT PRIMARY KEY NOT NULL,
+                        checksum TEXT NOT NULL,
+                        duration DOUBLE PRECISION NOT NULL,
+                        applied_at TIMESTAMP WITH TIME ZONE DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL
+                    )
+                    """
+                )
+
+                # Another process may have migrated while we waited on the lock.
+                records: list[Record] = await connection.fetch("SELECT name, checksum FROM schema_migrations")
+                applied = {record["name"]: record["checksum"] for record in records}
+
+                for migration in migrations:
+                    if applied.get(migration.name) == migration.checksum:
+                        continue
+
+                    start: float = time.perf_counter()
+                    try:
+                        await connection.execute(migration.read())
+                    except Exception:
+                        log.error("Failed to apply schema %r, rolling back all schemas.", migration.name)
+                        raise
+
+                    duration: float = time.perf_counter() - start
+                    await connection.execute(
+                        """
+                        INSERT INTO schema_migrations (name, checksum, duration) VALUES ($1, $2, $3)
+                        ON CONFLICT (name) DO UPDATE
+                        SET checksum = EXCLUDED.checksum, duration = EXCLUDED.duration, applied_at = DEFAULT
+                        """,
+                        migration.name,
+                        migration.checksum,
+                        duration,
+                    )
+
+                    results.append(MigrationResult(name=migration.name, duration=duration))
+                    log.info("Applied schema %r in %.2fms.", migration.name, duration * 1000)
+
+        return results
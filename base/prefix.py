@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from collections import defaultdict
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, DefaultDict, Iterable, Optional
+
+import attr
+from redis.exceptions import RedisError
+
+from .manager import PostgreSQLManager
+from .queries import Query, queries
+
+if TYPE_CHECKING:
+    from asyncpg import Pool, Record
+    from redis.asyncio import Redis
+    from redis.asyncio.client import PubSub
+
+__all__: tuple[str, ...] = ("PrefixManager", "MessageFilterStats")
+
+
+log: Logger = getLogger(__name__)
+
+LOAD_PREFIXES: Query = queries.register("load_prefixes", "SELECT gid, prefix FROM guild_prefixes ORDER BY gid, id")
+GUILD_PREFIXES: Query = queries.register("guild_prefixes", "SELECT prefix FROM guild_prefixes WHERE gid = $1 ORDER BY id")
+
+
+class PrefixManager:
+    """An in-memory view of the ``guild_prefixes`` table.
+
+    Every guild's prefixes are compiled into a single alternation pattern, longest
+    prefix first, so resolving the prefix of a message never touches the database.
+
+    Changes made through `add` and `remove` are announced over Redis pub/sub, every
+    other manager refreshes the guild as soon as the message arrives. Without ``redis``
+    the view only follows the changes of this process.
+
+    Parameters
+    ----------
+    pool : `Pool`
+        The pool to load prefixes from.
+    redis : `Optional[Redis]`
+        The shared Redis connection to announce and receive changes through.
+    default : `Iterable[str]`
+        The prefixes used in direct messages and in guilds without any rows.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "pool",
+        "manager",
+        "redis",
+        "default",
+        "_prefixes",
+        "_matchers",
+        "_default_matcher",
+        "_task",
+    )
+
+    CHANNEL: str = "robolia:guild-prefixes"
+
+    def __init__(self, pool: Pool[Record], *, redis: Optional[Redis] = None, default: Iterable[str] = ("pls",)) -> None:
+        self.pool: Pool[Record] = pool
+        self.manager: PostgreSQLManager = PostgreSQLManager(pool)
+        self.redis: Optional[Redis] = redis
+        self.default: tuple[str, ...] = tuple(default)
+
+        self._prefixes: dict[int, tuple[str, ...]] = {}
+        self._matchers: dict[int, re.Pattern[str]] = {}
+        self._default_matcher: re.Pattern[str] = self.compile(self.default)
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @staticmethod
+    def compile(prefixes: Iterable[str]) -> re.Pattern[str]:
+        # Longest first, otherwise "pls" would shadow "pls!" in the alternation.
+        ordered: list[str] = sorted(set(prefixes), key=len, reverse=True)
+        return re.compile("|".join(map(re.escape, ordered)))
+
+    def _store(self, guild_id: int, prefixes: Iterable[str]) -> None:
+        unique: tuple[str, ...] = tuple(dict.fromkeys(prefixes))
+        if not unique:
+            self._prefixes.pop(guild_id, None)
+            self._matchers.pop(guild_id, None)
+            return
+
+        self._prefixes[guild_id] = unique
+        self._matchers[guild_id] = self.compile(unique)
+
+    async def load(self) -> None:
+        records: list[Record] = await self.manager.fetch(LOAD_PREFIXES)
+
+        grouped: DefaultDict[int, list[str]] = defaultdict(list)
+        for record in records:
+            grouped[record["gid"]].append(record["prefix"])
+
+        self._prefixes.clear()
+        self._matchers.clear()
+        for guild_id, prefixes in grouped.items():
+            self._store(guild_id, prefixes)
+
+        log.info("Loaded %s prefixes for %s guilds.", len(records), len(grouped))
+
+    async def refresh(self, guild_id: int) -> None:
+        records: list[Record] = await self.manager.fetch(GUILD_PREFIXES, guild_id)
+        self._store(guild_id, (record["prefix"] for record in records))
+
+    async def add(self, guild_id: int, prefix: str) -> None:
+        async with self.manager.acquire_connection() as connection:
+            await connection.execute("INSERT INTO guilds (gid) VALUES ($1) ON CONFLICT DO NOTHING", guild_id)
+            await connection.execute(
+                "INSERT INTO guild_prefixes (gid, prefix) VALUES ($1, $2) ON CONFLICT DO NOTHING", guild_id, prefix
+            )
+
+        await self.refresh(guild_id)
+        await self._announce(guild_id)
+
+    async def remove(self, guild_id: int, prefix: str) -> None:
+        await self.manager.execute("DELETE FROM guild_prefixes WHERE gid = $1 AND prefix = $2", guild_id, prefix)
+        await self.refresh(guild_id)
+        await self._announce(guild_id)
+
+    async def _announce(self, guild_id: int) -> None:
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.publish(self.CHANNEL, str(guild_id))
+        except RedisError as exc:
+            log.warning("Failed to announce the prefix change of guild %s: %s", guild_id, exc)
+
+    async def start(self) -> None:
+        if self.redis is not None and self._task is None:
+            self._task = asyncio.create_task(self._listen(self.redis), name="guild-prefixes-invalidation")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self, redis: Redis) -> None:
+        while True:
+            pubsub: PubSub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    guild_id: int = int(message["data"])
+                    try:
+                        await self.refresh(guild_id)
+                    except Exception as exc:
+                        log.exception("Failed to refresh the prefixes of guild %s", guild_id, exc_info=exc)
+            except RedisError as exc:
+                # Changes may have been missed while disconnected, reload everything once back.
+                log.warning("Lost the guild prefixes subscription, reloading in 5s: %s", exc)
+                await asyncio.sleep(5)
+                await self._reload()
+            finally:
+                await pubsub.reset()
+
+    async def _reload(self) -> None:
+        try:
+            await self.load()
+        except Exception as exc:
+            log.exception("Failed to reload guild prefixes", exc_info=exc)
+
+    def get(self, guild_id: Optional[int]) -> tuple[str, ...]:
+        if guild_id is None:
+            return self.default
+        return self._prefixes.get(guild_id, self.default)
+
+    def match(self, guild_id: Optional[int], content: str) -> Optional[str]:
+        """Returns the prefix ``content`` starts with, if any."""
+        matcher: re.Pattern[str] = self._default_matcher
+        if guild_id is not None:
+            matcher = self._matchers.get(guild_id, self._default_matcher)
+
+        found: Optional[re.Match[str]] = matcher.match(content)
+        return found and found.group()
+
+    def __contains__(self, guild_id: Any) -> bool:
+        return guild_id in self._prefixes
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class MessageFilterStats:
+    """Counters for the pre-context filter in `RoboLia.process_commands`.
+
+    ``rejected`` messages never had a context built, ``accepted`` ones did, and
+    ``unknown`` is the subset of accepted messages that still had no command.
+    """
+
+    rejected: int = attr.ib(default=0)
+    accepted: int = attr.ib(default=0)
+    unknown: int = attr.ib(default=0)
+
+    @property
+    def total(self) -> int:
+        return self.rejected + self.accepted
+
+    @property
+    def ratio(self) -> float:
+        return self.rejected / self.total if self.total else 0.0
+
+    def reset(self) -> None:
+        self.rejected = self.accepted = self.unknown = 0
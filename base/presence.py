@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import datetime
+import sys
+import time
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Final, Optional
+
+from .manager import PostgreSQLManager
+from .queries import Query, queries
+
+if TYPE_CHECKING:
+    from asyncpg import Pool, Record
+
+    from .buffer import WriteBehindBuffer
+
+__all__: tuple[str, ...] = ("CompactPresence", "PresenceTracker")
+
+
+log: Logger = getLogger(__name__)
+
+TRACKED_USERS: Query = queries.register("tracked_users", "SELECT uid FROM users")
+
+# Gateway status -> presence_history.status
+STATUSES: Final[dict[str, str]] = {
+    "online": "Online",
+    "idle": "Idle",
+    "dnd": "DND",
+    "offline": "Offline",
+    "invisible": "Offline",
+}
+
+# client_status keys -> CompactPresence.platforms bits
+PLATFORMS: Final[dict[str, int]] = {"desktop": 1, "mobile": 2, "web": 4}
+
+
+class CompactPresence:
+    """A user's presence in a few dozen bytes, instead of a Member with its activities."""
+
+    __slots__: tuple[str, ...] = ("status", "platforms", "activity", "updated")
+
+    def __init__(self, status: str, platforms: int, activity: Optional[str], updated: float) -> None:
+        self.status: str = status
+        self.platforms: int = platforms
+        self.activity: Optional[str] = activity
+        self.updated: float = updated
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> CompactPresence:
+        platforms: int = 0
+        for platform in data.get("client_status", ()):
+            platforms |= PLATFORMS.get(platform, 0)
+
+        activities: list[dict[str, Any]] = data.get("activities") or []
+        activity: Optional[str] = sys.intern(activities[0]["name"]) if activities else None
+        return cls(STATUSES.get(data.get("status", "offline"), "Offline"), platforms, activity, time.time())
+
+    def __repr__(self) -> str:
+        return f"<CompactPresence status={self.status!r} platforms={self.platforms} activity={self.activity!r}>"
+
+
+class PresenceTracker:
+    """Records status changes of tracked users straight from raw PRESENCE_UPDATE payloads.
+
+    The latest presence of every tracked user is kept as a `CompactPresence`. A user
+    sharing several guilds with the bot gets one update per guild, only actual
+    status changes reach ``presence_history``.
+
+    Parameters
+    ----------
+    pool : `Pool`
+        The pool to read the tracked users from.
+    buffer : `WriteBehindBuffer`
+        Where the ``presence_history`` rows are written to.
+    """
+
+    __slots__: tuple[str, ...] = ("manager", "buffer", "users", "presences")
+
+    def __init__(self, pool: Pool[Record], buffer: WriteBehindBuffer) -> None:
+        self.manager: PostgreSQLManager = PostgreSQLManager(pool)
+        self.buffer: WriteBehindBuffer = buffer
+        self.users: set[int] = set()
+        self.presences: dict[int, CompactPresence] = {}
+
+    async def load(self) -> None:
+        records: list[Record] = await self.manager.fetch(TRACKED_USERS)
+        # Updated in place, the gateway filter holds a reference to this very set.
+        self.users.clear()
+        self.users.update(record["uid"] for record in records)
+        log.info("Tracking the presence of %s users.", len(self.users))
+
+    def track(self, user_id: int) -> None:
+        self.users.add(user_id)
+
+    def untrack(self, user_id: int) -> None:
+        self.users.discard(user_id)
+        self.presences.pop(user_id, None)
+
+    def get(self, user_id: int) -> Optional[CompactPresence]:
+        return self.presences.get(user_id)
+
+    def handle(self, data: dict[str, Any]) -> None:
+        user_id: int = int(data["user"]["id"])
+        if user_id not in self.users:
+            return
+
+        presence: CompactPresence = CompactPresence.from_data(data)
+        previous: Optional[CompactPresence] = self.presences.get(user_id)
+        self.presences[user_id] = presence
+        if previous is not None and previous.status == presence.status:
+            return
+
+        self.buffer.put_nowait(
+            "presence_history", user_id, presence.status, datetime.datetime.now(datetime.timezone.utc)
+        )
+
+    @staticmethod
+    def status_only(data: dict[str, Any]) -> bool:
+        """Whether a PRESENCE_UPDATE carries nothing but the presence.
+
+        Changes to the username, global name or avatar come with more of the user than
+        its ``id``. Those have to reach discord.py, whose parser dispatches ``on_user_update``.
+        """
+        return data.get("user", {}).keys() <= {"id"}
+
+    def on_guild_create(self, data: dict[str, Any]) -> None:
+        for presence in data.get("presences", ()):
+            self.handle(presence)
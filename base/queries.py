@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import time
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Iterator, Mapping, Optional
+from weakref import WeakKeyDictionary
+
+import attr
+from asyncpg import FeatureNotSupportedError, PostgresError
+
+if TYPE_CHECKING:
+    from asyncpg import Connection, Record
+    from asyncpg.pool import PoolConnectionProxy
+    from asyncpg.prepared_stmt import PreparedStatement
+
+__all__: tuple[str, ...] = ("Query", "QueryStats", "QueryRegistry", "queries")
+
+
+log: Logger = getLogger(__name__)
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True, weakref_slot=False)
+class Query:
+    """A named SQL statement, declared once through `QueryRegistry.register`."""
+
+    name: str
+    sql: str = attr.ib(repr=False)
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class QueryStats:
+    hits: int = attr.ib(default=0)
+    prepares: int = attr.ib(default=0)
+    prepare_time: float = attr.ib(default=0.0)
+    failures: int = attr.ib(default=0)
+
+    @property
+    def average_prepare_time(self) -> float:
+        return self.prepare_time / self.prepares if self.prepares else 0.0
+
+
+class QueryRegistry:
+    """Keeps every named statement prepared on every pool connection.
+
+    `prepare` is meant to be called from the pool's ``init`` hook, statements that
+    cannot be prepared yet (e.g. their tables do not exist) are prepared lazily on
+    first use instead.
+
+    Example
+    -------
+    >>> GET_USER = queries.register("get_user", "SELECT * FROM users WHERE uid = $1")
+    >>> await manager.fetchone(GET_USER, 1)
+    """
+
+    __slots__: tuple[str, ...] = ("_queries", "_stats", "_prepared")
+
+    def __init__(self) -> None:
+        self._queries: dict[str, Query] = {}
+        self._stats: dict[str, QueryStats] = {}
+        self._prepared: WeakKeyDictionary[Connection[Any], dict[str, PreparedStatement[Record]]] = WeakKeyDictionary()
+
+    def register(self, name: str, sql: str) -> Query:
+        if (existing := self._queries.get(name)) is not None:
+            if existing.sql != sql:
+                raise ValueError(f"Query {name!r} is already registered with a different statement.")
+            return existing
+
+        query: Query = Query(name=name, sql=sql)
+        self._queries[name] = query
+        self._stats[name] = QueryStats()
+        return query
+
+    def __getitem__(self, name: str) -> Query:
+        return self._queries[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._queries
+
+    def __iter__(self) -> Iterator[Query]:
+        return iter(self._queries.values())
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    @property
+    def stats(self) -> Mapping[str, QueryStats]:
+        return self._stats
+
+    def most_used(self, limit: Optional[int] = None) -> list[tuple[str, QueryStats]]:
+        return sorted(self._stats.items(), key=lambda item: item[1].hits, reverse=True)[:limit]
+
+    @staticmethod
+    def _raw(connection: Connection[Any] | PoolConnectionProxy[Any]) -> Connection[Any]:
+        # Pool proxies are handed out per acquire, the statements belong to the real connection.
+        return getattr(connection, "_con", None) or connection  # type: ignore
+
+    async def _prepare(self, connection: Connection[Any], query: Query) -> PreparedStatement[Record]:
+        stats: QueryStats = self._stats[query.name]
+        start: float = time.perf_counter()
+        try:
+            statement: PreparedStatement[Record] = await connection.prepare(query.sql)
+        except PostgresError:
+            stats.failures += 1
+            raise
+
+        stats.prepares += 1
+        stats.prepare_time += time.perf_counter() - start
+
+        self._prepared.setdefault(connection, {})[query.name] = statement
+        return statement
+
+    async def prepare(self, connection: Connection[Any]) -> None:
+        """Eagerly prepares every registered statement on ``connection``."""
+        connection = self._raw(connection)
+        for query in tuple(self._queries.values()):
+            try:
+                await self._prepare(connection, query)
+            except PostgresError as exc:
+                log.debug("Deferring preparation of %r: %s", query.name, exc)
+
+    async def statement(
+        self, connection: Connection[Any] | PoolConnectionProxy[Any], query: Query
+    ) -> PreparedStatement[Record]:
+        raw: Connection[Any] = self._raw(connection)
+        self._stats[query.name].hits += 1
+
+        statement: Optional[PreparedStatement[Record]] = self._prepared.get(raw, {}).get(query.name)
+        if statement is None:
+            statement = await self._prepare(raw, query)
+        return statement
+
+    def invalidate(self, connection: Connection[Any] | PoolConnectionProxy[Any], query: Query) -> None:
+        self._prepared.get(self._raw(connection), {}).pop(query.name, None)
+
+    async def run(
+        self,
+        connection: Connection[Any] | PoolConnectionProxy[Any],
+        query: Query,
+        method: str,
+        *args: Any,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        statement: PreparedStatement[Record] = await self.statement(connection, query)
+        try:
+            return await getattr(statement, method)(*args, timeout=timeout)
+        except FeatureNotSupportedError:
+            # "cached plan must not change result type", the schema moved underneath us.
+            # Only safe to retry outside of a transaction, which is now aborted otherwise.
+            self.invalidate(connection, query)
+            if connection.is_in_transaction():
+                raise
+
+            statement = await self._prepare(self._raw(connection), query)
+            return await getattr(statement, method)(*args, timeout=timeout)
+
+
+queries: QueryRegistry = QueryRegistry()
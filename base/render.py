@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import io
+from collections import OrderedDict
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Optional
+
+import attr
+import discord
+from PIL import Image, ImageDraw, ImageFont
+
+from utils import AsyncCache, CacheStats
+
+if TYPE_CHECKING:
+    from .executors import ExecutorLane
+
+__all__: tuple[str, ...] = ("Card", "CardRenderer", "render_card")
+
+
+log: Logger = getLogger(__name__)
+
+FONT_PATH: str = "assets/fonts/LemonMilk.ttf"
+
+BACKGROUND: tuple[int, int, int, int] = (0x23, 0x27, 0x2A, 0xFF)
+FOREGROUND: tuple[int, int, int, int] = (0xFF, 0xFF, 0xFF, 0xFF)
+MUTED: tuple[int, int, int, int] = (0xB9, 0xBB, 0xBE, 0xFF)
+
+
+@attr.s(auto_attribs=True, kw_only=True, frozen=True, slots=True, weakref_slot=False)
+class Card:
+    """Everything a card depends on, two equal cards render to the same bytes.
+
+    ``avatar`` stands in for the image in `key`, so renders check it against the bytes passed.
+    """
+
+    title: str
+    lines: tuple[str, ...] = attr.ib(default=(), converter=tuple)
+    avatar: Optional[bytes] = attr.ib(default=None)  # The SHA-256 of the avatar image.
+    width: int = attr.ib(default=800)
+    height: int = attr.ib(default=240)
+
+    def check(self, avatar: Optional[bytes]) -> None:
+        """Raises `ValueError` unless ``avatar`` is the image `avatar` is the digest of."""
+        if self.avatar is None:
+            if avatar is not None:
+                raise ValueError("Avatar bytes were passed for a card without an avatar digest.")
+        elif avatar is None:
+            raise ValueError("The card has an avatar digest but no avatar bytes were passed.")
+        elif hashlib.sha256(avatar).digest() != self.avatar:
+            raise ValueError("The avatar bytes do not match the card's avatar digest.")
+
+    @property
+    def key(self) -> bytes:
+        digest = hashlib.sha256()
+        for part in (self.title, *self.lines, str(self.width), str(self.height)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        digest.update(self.avatar or b"")
+        return digest.digest()
+
+
+# Everything below the cards runs in the worker processes, so the caches are per process.
+
+
+@functools.lru_cache(maxsize=16)
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(FONT_PATH, size)
+
+
+_AVATARS: OrderedDict[bytes, Image.Image] = OrderedDict()
+_AVATARS_MAXSIZE: int = 128
+
+
+def _avatar(digest: bytes, data: bytes, size: int) -> Image.Image:
+    key: bytes = digest + size.to_bytes(2, "big")
+    image: Optional[Image.Image] = _AVATARS.get(key)
+    if image is not None:
+        _AVATARS.move_to_end(key)
+        return image
+
+    with Image.open(io.BytesIO(data)) as source:
+        source.seek(0)  # First frame of animated avatars.
+        image = source.convert("RGBA").resize((size, size), Image.LANCZOS)
+
+    mask: Image.Image = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size - 1, size - 1), fill=255)
+    image.putalpha(mask)
+
+    _AVATARS[key] = image
+    if len(_AVATARS) > _AVATARS_MAXSIZE:
+        _AVATARS.popitem(last=False)
+    return image
+
+
+def render_card(card: Card, avatar: Optional[bytes] = None) -> bytes:
+    """Composites ``card`` into a PNG. CPU bound, meant for the ``cpu`` executor lane."""
+    card.check(avatar)
+    canvas: Image.Image = Image.new("RGBA", (card.width, card.height), BACKGROUND)
+    draw: ImageDraw.ImageDraw = ImageDraw.Draw(canvas)
+
+    padding: int = card.height // 12
+    x: int = padding
+    if card.avatar is not None and avatar is not None:  # Both or neither, see Card.check.
+        size: int = card.height - padding * 2
+        canvas.alpha_composite(_avatar(card.avatar, avatar, size), (padding, padding))
+        x += size + padding
+
+    title_font: ImageFont.FreeTypeFont = _font(card.height // 6)
+    line_font: ImageFont.FreeTypeFont = _font(card.height // 10)
+
+    y: int = padding
+    draw.text((x, y), card.title, font=title_font, fill=FOREGROUND)
+    y += title_font.size + padding
+    for line in card.lines:
+        draw.text((x, y), line, font=line_font, fill=MUTED)
+        y += line_font.size + padding // 2
+
+    buffer: io.BytesIO = io.BytesIO()
+    canvas.save(buffer, format="PNG", compress_level=6)
+    return buffer.getvalue()
+
+
+class CardRenderer:
+    """Renders `Card`\\s on an executor lane and keeps the encoded output around.
+
+    Identical cards, including ones requested while the first is still rendering,
+    are only rendered once.
+
+    Parameters
+    ----------
+    lane : `ExecutorLane`
+        Where to composite, normally the ``cpu`` lane.
+    maxsize : `int`
+        How many encoded cards to keep in memory.
+    ttl : `Optional[float]`
+        How long encoded cards are kept, in seconds.
+    """
+
+    def __init__(self, lane: ExecutorLane, *, maxsize: int = 256, ttl: Optional[float] = 600.0) -> None:
+        self.lane: ExecutorLane = lane
+        self._rendered: AsyncCache[bytes, bytes] = AsyncCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._rendered.stats
+
+    async def render(self, card: Card, avatar: Optional[bytes] = None) -> bytes:
+        # The key only covers the digest, so it has to be the digest of these bytes.
+        card.check(avatar)
+        return await self._rendered.get(card.key, lambda: self.lane.run(render_card, card, avatar))
+
+    async def file(self, card: Card, avatar: Optional[bytes] = None, *, filename: str = "card.png") -> discord.File:
+        return discord.File(io.BytesIO(await self.render(card, avatar)), filename=filename)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import pathlib
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .avatars import AvatarStore
+from .batching import RedisBatcher
+from .buffer import WriteBehindBuffer
+from .executors import ExecutorLanes
+from .fetcher import AvatarFetcher
+from .guilds import GuildSettingsCache
+from .migrations import MigrationResult, MigrationRunner
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+    from asyncpg import Pool, Record
+    from redis.asyncio import Redis
+
+__all__: tuple[str, ...] = ("SharedResources",)
+
+
+log: Logger = getLogger(__name__)
+
+
+class SharedResources:
+    """What the shards of one process share, next to its session, pool and Redis.
+
+    A single RoboLia builds its own. A cluster worker builds one, hands it to every
+    shard it runs and owns `migrate`, `start` and `close`, as it does for the pool.
+    Caches of the shard's own guilds and members are not in here, they are per shard.
+
+    Parameters
+    ----------
+    session : `ClientSession`
+        The shared HTTP session.
+    pool : `Pool`
+        The shared pool.
+    redis : `Redis`
+        The shared Redis connection.
+    executors : `Optional[ExecutorLanes]`
+        The executor lanes, the default ones size the ``cpu`` lane for the whole machine.
+
+    Example
+    -------
+    >>> resources = SharedResources(session, pool, redis)
+    >>> await resources.migrate(schemas)
+    >>> await resources.start()
+    >>> bots = [RoboLia(..., shard_id=shard_id, resources=resources) for shard_id in shard_ids]
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        pool: Pool[Record],
+        redis: Redis,
+        *,
+        executors: Optional[ExecutorLanes] = None,
+    ) -> None:
+        self.pool: Pool[Record] = pool
+        self.executors: ExecutorLanes = executors or ExecutorLanes()
+        self.batcher: RedisBatcher = RedisBatcher(redis)
+        self.guild_settings: GuildSettingsCache = GuildSettingsCache(pool, redis)
+        self.avatars: AvatarStore = AvatarStore(pool)
+        self.avatar_fetcher: AvatarFetcher = AvatarFetcher(session, self.avatars, lane=self.executors.io)
+
+        # Append-only event logs, written in bulk instead of one INSERT per event.
+        self.history: WriteBehindBuffer = WriteBehindBuffer(pool, lane=self.executors.blocking)
+        self.history.register("presence_history", ("uid", "status", "changed_at"))
+        self.history.register("owo_counting", ("uid", "created_at", "word"))
+        self.history.register("item_history", ("uid", "item_type", "item_value", "changed_at"))
+
+    async def migrate(self, schemas: Iterable[pathlib.Path]) -> list[MigrationResult]:
+        applied: list[MigrationResult] = await MigrationRunner(self.pool).run(schemas)
+        if applied:
+            # Recycle idle connections so the init hook re-prepares every named
+            # statement against the schema we just applied.
+            await self.pool.expire_connections()
+        return applied
+
+    async def start(self) -> None:
+        await self.history.start()
+        await self.guild_settings.start()
+
+    async def close(self) -> None:
+        # Must run before the pool goes away, anything left over is spilled to disk.
+        await self.history.close()
+        await self.guild_settings.close()
+        await self.batcher.close()
+        await self.executors.close()
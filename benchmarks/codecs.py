@@ -0,0 +1,137 @@
+"""Times decoding gateway frames with base.codecs against the standard library.
+
+The stdlib path is the one discord.py takes without orjson: the frame is decoded
+to text, then parsed with json.loads. base.codecs.loads parses the bytes directly.
+
+    python -m benchmarks.codecs
+    python -m benchmarks.codecs --payload guild_create.json --payload presence_update.json
+
+Recorded frames can be passed with --payload, one JSON frame per file. Without any,
+synthetic GUILD_CREATE and PRESENCE_UPDATE frames shaped like Discord's are used.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import random
+import sys
+import timeit
+from typing import Any, Callable, Optional
+
+# Run from the repository root, like the bot itself.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from base.codecs import HAS_ORJSON, dumps_bytes, loads  # noqa: E402
+
+
+def _user(rng: random.Random, index: int) -> dict[str, Any]:
+    return {
+        "id": str(rng.getrandbits(60)),
+        "username": f"user{index}",
+        "global_name": f"Üser ✨ {index}",
+        "discriminator": "0",
+        "avatar": f"{rng.getrandbits(128):032x}",
+        "public_flags": 0,
+    }
+
+
+def _presence(rng: random.Random, user: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "user": {"id": user["id"]},
+        "status": rng.choice(("online", "idle", "dnd")),
+        "client_status": {"desktop": "online", "mobile": "idle"},
+        "activities": [
+            {
+                "type": 0,
+                "name": "Visual Studio Code",
+                "state": "Workspace: robolia",
+                "details": "Editing bot.py",
+                "created_at": 1_700_000_000_000,
+                "timestamps": {"start": 1_700_000_000_000},
+                "assets": {"large_image": "mp:external/abc", "large_text": "Python"},
+            }
+        ],
+    }
+
+
+def guild_create(members: int = 1000, channels: int = 100, roles: int = 50, *, seed: int = 0) -> dict[str, Any]:
+    rng: random.Random = random.Random(seed)
+    users: list[dict[str, Any]] = [_user(rng, index) for index in range(members)]
+    guild_id: str = str(rng.getrandbits(60))
+    return {
+        "op": 0,
+        "s": 2,
+        "t": "GUILD_CREATE",
+        "d": {
+            "id": guild_id,
+            "name": "Robolia 🤖",
+            "owner_id": users[0]["id"],
+            "member_count": members,
+            "large": members >= 250,
+            "roles": [
+                {"id": str(rng.getrandbits(60)), "name": f"role {i}", "permissions": "1071698660929", "position": i}
+                for i in range(roles)
+            ],
+            "channels": [
+                {
+                    "id": str(rng.getrandbits(60)),
+                    "type": 0,
+                    "name": f"channel-{i}",
+                    "position": i,
+                    "permission_overwrites": [{"id": guild_id, "type": 0, "allow": "0", "deny": "1024"}],
+                    "topic": "A channel about nothing in particular",
+                }
+                for i in range(channels)
+            ],
+            "members": [
+                {"user": user, "roles": [], "joined_at": "2023-01-01T00:00:00.000000+00:00", "deaf": False, "mute": False}
+                for user in users
+            ],
+            "presences": [_presence(rng, user) for user in users[: members // 2]],
+        },
+    }
+
+
+def presence_update(*, seed: int = 0) -> dict[str, Any]:
+    rng: random.Random = random.Random(seed)
+    data: dict[str, Any] = _presence(rng, _user(rng, 0))
+    data["guild_id"] = str(rng.getrandbits(60))
+    return {"op": 0, "s": 3, "t": "PRESENCE_UPDATE", "d": data}
+
+
+def _stdlib(frame: bytes) -> Any:
+    return json.loads(frame.decode("utf-8"))
+
+
+def _measure(func: Callable[[bytes], Any], frame: bytes, *, seconds: float) -> float:
+    timer: timeit.Timer = timeit.Timer(lambda: func(frame))
+    number, elapsed = timer.autorange()
+    repeat: int = max(int(seconds / max(elapsed, 1e-9)), 3)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payload", action="append", type=pathlib.Path, default=[], help="a recorded frame")
+    parser.add_argument("--seconds", type=float, default=1.0, help="roughly how long to time each decoder")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    frames: list[tuple[str, bytes]] = [(path.name, path.read_bytes()) for path in args.payload] or [
+        ("GUILD_CREATE, 1000 members", dumps_bytes(guild_create())),
+        ("GUILD_CREATE, 10000 members", dumps_bytes(guild_create(10_000, 500, 200))),
+        ("PRESENCE_UPDATE", dumps_bytes(presence_update())),
+    ]
+
+    print(f"base.codecs uses {'orjson' if HAS_ORJSON else 'the stdlib fallback'}")
+    for name, frame in frames:
+        stdlib: float = _measure(_stdlib, frame, seconds=args.seconds)
+        codecs: float = _measure(loads, frame, seconds=args.seconds)
+        print(
+            f"{name} ({len(frame) / 1024:,.1f} KiB): stdlib {stdlib * 1e6:,.1f}us, "
+            f"base.codecs {codecs * 1e6:,.1f}us ({stdlib / codecs:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
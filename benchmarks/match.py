@@ -0,0 +1,57 @@
+"""Compares NGramMatch against pairwise difflib scoring.
+
+    python -m benchmarks.match --options 100000 --queries 20
+
+The targets are options with their last letter replaced, so none match exactly.
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import random
+import string
+import time
+from typing import Iterable, Optional
+
+from base.match import NGramMatch
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--options", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--naive", type=int, default=3, help="how many queries to score with difflib")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    rng: random.Random = random.Random(0)
+    options: list[str] = [
+        " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3)))
+        for _ in range(args.options)
+    ]
+    targets: list[str] = [option[:-1] + "x" for option in rng.sample(options, args.queries)]
+
+    start: float = time.perf_counter()
+    matcher: NGramMatch = NGramMatch(options)
+    print(f"index {args.options:,} options: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for target in targets:
+        matcher.match(target, limit=5)
+    indexed: float = (time.perf_counter() - start) / len(targets)
+    print(f"ngram: {indexed * 1000:.2f}ms/query")
+
+    def naive(target: str) -> list[tuple[float, str]]:
+        scored: Iterable[tuple[float, str]] = (
+            (difflib.SequenceMatcher(None, target, option).ratio(), option) for option in options
+        )
+        return sorted(scored, reverse=True)[:5]
+
+    start = time.perf_counter()
+    for target in targets[: args.naive]:
+        naive(target)
+    pairwise: float = (time.perf_counter() - start) / args.naive
+    print(f"difflib: {pairwise * 1000:.2f}ms/query ({pairwise / indexed:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
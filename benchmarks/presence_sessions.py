@@ -0,0 +1,130 @@
+"""Compares get_total_seconds before and after presence sessionizing.
+
+Loads ``--rows`` synthetic presence_history rows into a scratch schema, builds the
+sessions and daily totals with backfill_presence_sessions() and times both queries.
+The old query is the LEAD() window partitioned by user, as it was meant to be, once
+over the bare table as in production and once with a (uid, changed_at) index.
+
+    python -m benchmarks.presence_sessions --dsn postgresql://localhost/robolia --rows 10000000
+
+Everything lives in the ``robolia_bench`` schema, which is dropped afterwards.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import pathlib
+import statistics
+import time
+from typing import Any, Optional
+
+import asyncpg
+
+SCHEMA: str = "robolia_bench"
+ROOT: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent
+
+TABLES: str = """
+CREATE TABLE users (uid BIGINT PRIMARY KEY NOT NULL);
+CREATE TABLE presence_history (
+  id BIGSERIAL PRIMARY KEY NOT NULL,
+  uid BIGINT NOT NULL REFERENCES users(uid) ON DELETE CASCADE,
+  status TEXT NOT NULL,
+  changed_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+"""
+
+# Status changes spread over the last year, in order per user like the gateway sends them.
+ROWS: str = """
+INSERT INTO users (uid) SELECT generate_series(1, {users});
+INSERT INTO presence_history (uid, status, changed_at)
+SELECT
+  1 + (n % {users}),
+  (ARRAY['Online', 'Idle', 'DND', 'Offline'])[1 + (random() * 3)::INT],
+  now() - INTERVAL '365 days' + (n::FLOAT8 / {rows}) * INTERVAL '365 days'
+FROM generate_series(1, {rows}) AS n;
+"""
+
+# The old get_total_seconds, partitioned by uid instead of presence_history.id.
+WINDOW: str = """
+SELECT sc.status,
+  CAST(SUM(EXTRACT(EPOCH FROM (COALESCE(sc.next_changed_at, now()) - sc.changed_at))) AS BIGINT)
+FROM (
+  SELECT sh.status, sh.changed_at,
+    LEAD(sh.changed_at) OVER (PARTITION BY sh.uid ORDER BY sh.changed_at) AS next_changed_at
+  FROM presence_history sh
+  WHERE sh.uid = $1
+  AND ($2::INTEGER IS NULL OR sh.changed_at >= now() - INTERVAL '1 DAY' * $2::INTEGER)
+) sc
+GROUP BY sc.status
+"""
+
+SESSIONS: str = "SELECT * FROM get_total_seconds($1, $2)"
+
+
+async def _time(connection: asyncpg.Connection, query: str, *args: Any, repeat: int) -> float:
+    timings: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        await connection.fetch(query, *args)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def _plan(connection: asyncpg.Connection, query: str, *args: Any) -> str:
+    rows: list[asyncpg.Record] = await connection.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {query}", *args)
+    return "\n".join(f"    {row[0]}" for row in rows)
+
+
+async def run(dsn: str, *, rows: int, users: int, repeat: int, plans: bool) -> None:
+    connection: asyncpg.Connection = await asyncpg.connect(dsn)
+    try:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await connection.execute(f"SET search_path TO {SCHEMA}")
+        await connection.execute(TABLES)
+
+        start: float = time.perf_counter()
+        await connection.execute(ROWS.format(users=int(users), rows=int(rows)))
+        print(f"loaded {rows:,} rows for {users:,} users: {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        await connection.execute((ROOT / "schemas" / "additional" / "presence_sessions.sql").read_text())
+        sessions: int = await connection.fetchval("SELECT backfill_presence_sessions()")
+        await connection.execute("ANALYZE presence_history, presence_sessions, presence_daily")
+        print(f"backfilled {sessions:,} sessions: {time.perf_counter() - start:.1f}s")
+
+        uid: int = users // 2
+        variants: list[tuple[str, str]] = [("window", WINDOW), ("sessions", SESSIONS)]
+        for days in (7, 30, None):
+            label: str = f"{days} days" if days else "all time"
+            for name, query in variants:
+                print(f"{label:>9} {name:<16} {await _time(connection, query, uid, days, repeat=repeat):9.2f}ms")
+                if plans:
+                    print(await _plan(connection, query, uid, days))
+
+        await connection.execute("CREATE INDEX ON presence_history (uid, changed_at); ANALYZE presence_history")
+        for days in (7, 30, None):
+            label = f"{days} days" if days else "all time"
+            print(f"{label:>9} {'window + index':<16} {await _time(connection, WINDOW, uid, days, repeat=repeat):9.2f}ms")
+            if plans:
+                print(await _plan(connection, WINDOW, uid, days))
+    finally:
+        await connection.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await connection.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("ROBOLIA_BENCH_DSN"), help="defaults to $ROBOLIA_BENCH_DSN")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--plans", action="store_true", help="print EXPLAIN ANALYZE of every query")
+    args: argparse.Namespace = parser.parse_args(argv)
+    if args.dsn is None:
+        parser.error("a --dsn or $ROBOLIA_BENCH_DSN is required")
+    asyncio.run(run(args.dsn, rows=args.rows, users=args.users, repeat=args.repeat, plans=args.plans))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Measures card render throughput on one worker process and on every core.
+
+    python -m benchmarks.render --cards 200
+
+Run it from the repository root, the font is loaded from ``assets/fonts``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Optional
+
+from base.executors import ExecutorLane, LaneConfig
+from base.render import Card, render_card
+
+
+async def run(cards: list[Card], workers: int) -> float:
+    lane: ExecutorLane = ExecutorLane("bench", LaneConfig(workers=workers, max_pending=workers * 4, processes=True))
+    try:
+        # One job per worker, so every worker is spawned and has imported Pillow before the timing.
+        await asyncio.gather(*(lane.run(render_card, cards[0]) for _ in range(workers)))
+        start: float = time.perf_counter()
+        await asyncio.gather(*(lane.run(render_card, card) for card in cards))
+        return len(cards) / (time.perf_counter() - start)
+    finally:
+        await lane.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=200)
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    cards: list[Card] = [Card(title=f"User {i}", lines=(f"Score {i * 7}", f"Rank #{i}")) for i in range(args.cards)]
+    cores: int = os.cpu_count() or 1
+    print(f"1 core: {asyncio.run(run(cards, 1)):.1f} cards/s")
+    print(f"{cores} cores: {asyncio.run(run(cards, cores)):.1f} cards/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,18 @@ import functools
 import itertools
 import os
 import pathlib
-import re
-from asyncio import AbstractEventLoop, to_thread
-from collections import defaultdict
+import time
+from asyncio import AbstractEventLoop
 from logging import Logger, getLogger
 from typing import (
     TYPE_CHECKING,
     Any,
     Awaitable,
     Callable,
-    DefaultDict,
     Iterable,
     Iterator,
     Mapping,
+    Optional,
     ParamSpec,
     Self,
     Type,
@@ -30,12 +29,39 @@ import discord
 from discord.ext import commands
 from redis.asyncio import Redis
 
-from base import Gateway, PostgreSQLManager
+from base import (
+    AvatarFetcher,
+    AvatarStore,
+    CachePolicy,
+    ExecutorLanes,
+    Gateway,
+    GatewayFilter,
+    GuildSettingsCache,
+    IdentifyLimiter,
+    MemberCache,
+    MessageFilterStats,
+    PostgreSQLManager,
+    PrefixManager,
+    PresenceTracker,
+    RedisBatcher,
+    ResumeState,
+    ResumeStore,
+    SharedResources,
+    Timer,
+    WriteBehindBuffer,
+    metrics,
+    queries,
+    register_json_codecs,
+    restore_guilds,
+)
+from startup import StartupGraph, profiler, warm_imports
 from utils import _RLC, RoboLiaContext
 
 if TYPE_CHECKING:
     from datetime import datetime
 
+    from base import CardRenderer
+
     from aiohttp import ClientSession
     from asyncpg import Connection, Pool, Record
 
@@ -60,7 +86,15 @@ class RoboLia(commands.Bot):
         session: ClientSession,
         pool: Pool,
         redis: Redis,
+        shard_id: Optional[int] = None,
+        shard_count: Optional[int] = None,
+        identify_limiter: Optional[IdentifyLimiter] = None,
+        owns_resources: bool = True,
+        resume_store: Optional[ResumeStore] = None,
+        cache_policy: Optional[CachePolicy] = None,
+        resources: Optional[SharedResources] = None,
     ) -> None:
+        self.cache_policy: CachePolicy = cache_policy or CachePolicy()
         intents: discord.Intents = discord.Intents(
             guilds=True,
             members=True,
@@ -74,8 +108,10 @@ class RoboLia(commands.Bot):
             case_insensitive=True,
             intents=intents,
             strip_after_prefix=True,
-            chung_guilds_at_startup=False,
-            max_messages=2000,
+            chunk_guilds_at_startup=False,
+            max_messages=self.cache_policy.max_messages,
+            shard_id=shard_id,
+            shard_count=shard_count,
             owner_ids=[
                 852419718819348510,  # Lia Marie (https://github.com/qt-haskell)
                 546691865374752778,  # Utkarsh   (https://github.com/utkarshgupta2504)
@@ -88,31 +124,63 @@ class RoboLia(commands.Bot):
         self.pool: Pool[Record] = pool
         self.redis: Redis = redis
 
-        self.cached_prefixes: DefaultDict[int, list[re.Pattern[str]]] = defaultdict(list)
+        # Clustered shards share the session, pool, Redis and `SharedResources` of their
+        # worker process, which then owns starting and closing them. They also identify
+        # through a shared limiter.
+        self.identify_limiter: Optional[IdentifyLimiter] = identify_limiter
+        self.owns_resources: bool = owns_resources
+        self.owns_shared: bool = resources is None
+        self.resources: SharedResources = resources or SharedResources(session, pool, redis)
+        self.executors: ExecutorLanes = self.resources.executors
+        self.batcher: RedisBatcher = self.resources.batcher
+
+        self.resume_store: Optional[ResumeStore] = resume_store
+        self._suspending: bool = False
+        # Set when a RESUMEd session could not be restored, the next connection IDENTIFYs.
+        self._identify_next: bool = False
+
+        self.prefixes: PrefixManager = PrefixManager(pool, redis=redis, default=("pls", "pls "))
+        self.message_stats: MessageFilterStats = MessageFilterStats()
+        self._mention_prefixes: tuple[str, ...] = ()
+
+        self.avatars: AvatarStore = self.resources.avatars
+        self.avatar_fetcher: AvatarFetcher = self.resources.avatar_fetcher
+        self.guild_settings: GuildSettingsCache = self.resources.guild_settings
+        self.history: WriteBehindBuffer = self.resources.history
+
+        # Presences of tracked users are recorded from the raw payload. Status-only updates
+        # stop there, user changes still reach discord.py for on_user_update. Member.status
+        # and activities are not kept up to date, the tracker is where presences are read.
+        self.presence: PresenceTracker = PresenceTracker(pool, self.history)
+        self.gateway_filter: GatewayFilter = GatewayFilter(drop={"TYPING_START"}, users=self.presence.users)
+        self.gateway_filter.add_handler("PRESENCE_UPDATE", self.presence.handle, consume=self.presence.status_only)
+
+        # Only tracked users, the bot and recently active members stay in the member cache.
+        self.members: MemberCache = MemberCache(self, self.cache_policy, tracked=self.presence.users)
+        self.gateway_filter.add_handler("GUILD_CREATE", self.presence.on_guild_create)
+        self.gateway_filter.add_handler("GUILD_CREATE", self.members.on_guild_create)
+        self.gateway_filter.add_handler("MESSAGE_CREATE", self.members.on_message)
 
     @discord.utils.cached_property
     def logger(self) -> Logger:
         return getLogger("robolia")
 
+    @discord.utils.cached_property
+    def cards(self) -> CardRenderer:
+        # Built on first use, importing Pillow is not worth it for a bot that never renders.
+        from base import CardRenderer
+
+        return CardRenderer(self.executors.cpu)
+
     @classmethod
     @discord.utils.copy_doc(asyncpg.create_pool)
     def setup_pool(cls: Type[Self], *, dsn: str, **kwargs: Any) -> Pool[Record]:
-        def serializer(obj: Any) -> str:
-            return discord.utils._to_json(obj)
-
-        def deserializer(s: str) -> Any:
-            return discord.utils._from_json(s)
-
         prep_init: Any | None = kwargs.pop("init", None)
 
         async def init(conn: Connection[Any]) -> None:
-            await conn.set_type_codec(
-                typename="json",
-                encoder=serializer,
-                decoder=deserializer,
-                schema="pg_catalog",
-                format="text",
-            )
+            await register_json_codecs(conn)
+            # Statements whose tables do not exist yet are prepared lazily on first use.
+            await queries.prepare(conn)
             if prep_init is not None:
                 await prep_init(conn)
 
@@ -127,21 +195,71 @@ class RoboLia(commands.Bot):
             raise
 
     async def get_prefix(self, message: discord.Message) -> list[str] | str:
-        return commands.when_mentioned_or(*("pls", "pls "))(self, message)
+        # Only hand back the prefix that actually matched, so discord.py's own
+        # startswith scan over the returned list stays trivial.
+        guild_id: int | None = message.guild and message.guild.id
+        prefix: str | None = self.prefixes.match(guild_id, message.content)
+        return commands.when_mentioned_or(*((prefix,) if prefix else ()))(self, message)
 
     async def get_context(self, message: discord.Message, *, cls: Type[_RLC] = RoboLiaContext) -> RoboLiaContext:
         return await super().get_context(message, cls=cls or commands.Context[_RLT])
 
+    def is_command_candidate(self, message: discord.Message, /) -> bool:
+        """Cheap, synchronous check on whether ``message`` could invoke a command at all."""
+        content: str = message.content
+        if not content:
+            return False
+
+        if content.startswith(self._mention_prefixes):
+            return True
+
+        guild: discord.Guild | None = message.guild
+        return self.prefixes.match(guild and guild.id, content) is not None
+
+    def _schedule_event(
+        self, coro: Callable[..., Awaitable[Any]], event_name: str, *args: Any, **kwargs: Any
+    ) -> asyncio.Task[None]:
+        if not metrics.enabled:
+            return super()._schedule_event(coro, event_name, *args, **kwargs)
+
+        scheduled: float = time.perf_counter()
+        tags: tuple[str, ...] = (f"event:{event_name}",)
+
+        async def timed(*args: Any, **kwargs: Any) -> None:
+            start: float = time.perf_counter()
+            # Time spent waiting on the loop between dispatch and the handler starting.
+            metrics.timing("dispatch.latency", (start - scheduled) * 1000, tags=tags)
+            try:
+                await coro(*args, **kwargs)
+            finally:
+                metrics.timing("dispatch.handler", (time.perf_counter() - start) * 1000, tags=tags)
+
+        return super()._schedule_event(timed, event_name, *args, **kwargs)
+
     async def process_commands(self, message: discord.Message, /) -> None:
-        try:
-            await asyncio.wait_for(self.wait_until_ready(), timeout=5.0)
-        except asyncio.TimeoutError:
+        # Most messages are not commands, drop them before a context is ever built.
+        if not self.is_command_candidate(message):
+            self.message_stats.rejected += 1
             return
 
+        self.message_stats.accepted += 1
+        with metrics.timed("commands.process") as timer:
+            await self._process_commands(message, timer)
+
+    async def _process_commands(self, message: discord.Message, timer: Timer, /) -> None:
+        if not self.is_ready():
+            try:
+                await asyncio.wait_for(self.wait_until_ready(), timeout=5.0)
+            except asyncio.TimeoutError:
+                return
+
         ctx: RoboLiaContext = await self.get_context(message, cls=RoboLiaContext)
         if ctx.command is None:
+            self.message_stats.unknown += 1
             return
 
+        timer.tags = (f"command:{ctx.command.qualified_name}",)
+
         if ctx.guild:
             if TYPE_CHECKING:
                 # These are lies, but correct enough
@@ -156,18 +274,56 @@ class RoboLia(commands.Bot):
 
         await self.invoke(ctx)
 
+    async def invoke(self, ctx: commands.Context[Any], /) -> None:
+        if not metrics.enabled or ctx.command is None:
+            return await super().invoke(ctx)
+
+        start: float = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            failed: bool = ctx.command_failed
+            metrics.timing(
+                "commands.invoke",
+                (time.perf_counter() - start) * 1000,
+                tags=(f"command:{ctx.command.qualified_name}", f"failed:{str(failed).lower()}"),
+            )
+
+    async def suspend(self) -> None:
+        """Closes the gateway without invalidating the session and saves it for the next process."""
+        if self.resume_store is None or self.ws is None or not self.ws.open:
+            return
+
+        self._suspending = True
+        await self.resume_store.stop()
+        # Any close code other than 1000 and 1001 keeps the session resumable.
+        await self.ws.close(code=4000)
+        await self.resume_store.save(self.shard_id, self.ws)
+        self.logger.info("Saved the gateway session of shard ID %s for resuming.", self.shard_id)
+
     async def close(self) -> None:
         self.logger.info("Closing RoboLia...")
+        await self.suspend()
         await asyncio.sleep(1)
 
+        await self.members.close()
+        await self.prefixes.close()
+        if self.owns_shared:
+            await self.resources.close()
+
         # Do not remove, allows graceful disconnects
-        to_close = [self.session, self.pool, self.redis]
-        await asyncio.gather(*[x.close() for x in to_close if x is not None])
+        if self.owns_resources:
+            to_close = [self.session, self.pool, self.redis]
+            await asyncio.gather(*[x.close() for x in to_close if x is not None])
 
         await super().close()
 
     async def wrap(self, func: Callable[_P, _T], *args: _P.args, **kwargs: _P.kwargs) -> _T:
-        return await to_thread(func, *args, **kwargs)
+        return await self.executors.io.run(func, *args, **kwargs)
+
+    async def compute(self, func: Callable[_P, _T], *args: _P.args, **kwargs: _P.kwargs) -> _T:
+        """Runs ``func`` in a worker process, it and its arguments must be picklable."""
+        return await self.executors.cpu.run(func, *args, **kwargs)
 
     def chunk(self, iterable: Iterable[_T], size: int) -> Iterator[list[_T]]:
         it: Iterator[_T] = iter(iterable)
@@ -189,20 +345,111 @@ class RoboLia(commands.Bot):
 
             yield schema
 
+    async def _warm_extension(self, extension: str) -> None:
+        # Only the extension's dependencies are imported and its bytecode compiled, the
+        # module itself runs once, on the loop, when load_extension gets to it.
+        try:
+            await self.executors.io.run(warm_imports, extension)
+        except Exception:
+            # Left for load_extension to raise and log.
+            pass
+
+    async def _load_extension(self, extension: str) -> None:
+        try:
+            await self.load_extension(extension)
+        except Exception as exc:
+            self.logger.exception(f"Failed to load extension {extension!r}", exc_info=exc)
+
+    async def _apply_schemas(self) -> None:
+        # Shared resources are migrated once by the process that owns them.
+        if not self.owns_shared:
+            return
+
+        try:
+            await self.resources.migrate(self.get_schemas())
+        except Exception as exc:
+            self.logger.exception("Failed to apply schemas", exc_info=exc)
+
+    async def _start_background(self) -> None:
+        try:
+            if self.owns_shared:
+                await self.resources.start()
+            await self.members.start()
+        except Exception as exc:
+            self.logger.exception("Failed to start the background tasks", exc_info=exc)
+
+    async def _load_prefixes(self) -> None:
+        try:
+            await self.prefixes.load()
+        except Exception as exc:
+            self.logger.exception("Failed to load guild prefixes, falling back to defaults", exc_info=exc)
+        await self.prefixes.start()
+
+    async def _load_presence(self) -> None:
+        try:
+            await self.presence.load()
+        except Exception as exc:
+            self.logger.exception("Failed to load tracked users, presences are not recorded", exc_info=exc)
+
     async def setup_hook(self) -> None:
+        self._mention_prefixes = (f"<@{self.user.id}>", f"<@!{self.user.id}>")
+
+        # Schemas apply while extensions import in the io lane. Extensions, the background
+        # tasks and the caches only touch the database once the schemas are applied.
+        graph: StartupGraph = StartupGraph()
+        graph.add("migrations", self._apply_schemas)
         for extension in self.get_extensions():
-            try:
-                await self.load_extension(extension)
-            except Exception as exc:
-                self.logger.exception(f"Failed to load extension {extension!r}", exc_info=exc)
+            graph.add(f"import {extension}", functools.partial(self._warm_extension, extension))
+            graph.add(
+                f"load {extension}",
+                functools.partial(self._load_extension, extension),
+                after=(f"import {extension}", "migrations"),
+            )
 
-        for schema in self.get_schemas():
-            try:
-                await self.pool.execute(schema.read_text())
-            except Exception as exc:
-                self.logger.exception(f"Failed to load schema {schema!r}", exc_info=exc)
+        graph.add("background", self._start_background, after=("migrations",))
+        graph.add("prefixes", self._load_prefixes, after=("migrations",))
+        graph.add("presence", self._load_presence, after=("migrations",))
+        graph.add("load jishaku", functools.partial(self._load_extension, "jishaku"))
+
+        with profiler.phase("setup_hook"):
+            await graph.run()
+
+        if profiler.enabled:
+            self.logger.info("Startup profile:\n%s", profiler.report())
+
+    async def on_resumed(self) -> None:
+        # RESUMEd a session of a previous process, READY is never coming and neither are
+        # the GUILD_CREATEs, so the guild cache is restored before anything relies on it.
+        if self.is_ready():
+            return
+
+        self.logger.info("Resumed a previous session, restoring the guild cache.")
+        try:
+            restored: Optional[int] = await restore_guilds(self)
+        except Exception as exc:
+            self.logger.exception("Failed to restore the guild cache, identifying instead", exc_info=exc)
+            restored = None
+        else:
+            if restored is None:
+                self.logger.info("Too many guilds to restore over REST, identifying instead.")
+
+        if restored is None:
+            self._identify_next = True
+            if self.ws is not None:
+                await self.ws.close(code=4000)
+            return
+
+        self.logger.info("Restored %s guilds.", restored)
+        self._ready.set()
+
+        if getattr(self, "timestamp", None) is None:
+            self.timestamp = discord.utils.utcnow()
 
-        await self.load_extension("jishaku")
+    async def before_identify_hook(self, shard_id: int | None, *, initial: bool = False) -> None:
+        if self.identify_limiter is None:
+            return await super().before_identify_hook(shard_id, initial=initial)
+
+        await self.identify_limiter.acquire(shard_id)
 
     async def on_ready(self) -> None:
         self.logger.info("Connected to Discord.")
@@ -211,11 +458,19 @@ class RoboLia(commands.Bot):
             self.timestamp = discord.utils.utcnow()
 
     def exec(self, func: Callable[..., _T], *args, **kwargs) -> Awaitable[_T]:
-        return self.loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+        return self.executors.blocking.run(func, *args, **kwargs)
 
     async def connect(self, *, reconnect: bool = True) -> None:
         backoff = discord.client.ExponentialBackoff()  # type: ignore
         ws_params: dict[str, Any] = {"initial": True, "shard_id": self.shard_id}
+        if self.resume_store is not None:
+            state: ResumeState | None = await self.resume_store.load(self.shard_id)
+            if state is not None:
+                # An invalid session is answered with INVALID_SESSION, which falls back to IDENTIFY.
+                self.logger.info("Attempting to RESUME session %s of shard ID %s.", state.session_id, self.shard_id)
+                ws_params.update(state.to_params())
+            self.resume_store.start(self.shard_id, lambda: self.ws)
+
         while not self.is_closed():
             try:
                 coro: Any = Gateway.from_client(self, **ws_params)
@@ -224,12 +479,22 @@ class RoboLia(commands.Bot):
                 while True:
                     await self.ws.poll_event()
             except discord.client.ReconnectWebSocket as e:
-                self.logger.info("Got a request to %s the websocket.", e.op)
                 self.dispatch("disconnect")
+                if self._suspending:
+                    return
+
+                self.logger.info("Got a request to %s the websocket.", e.op)
+                if self._identify_next:
+                    # READY clears whatever was restored before this.
+                    self._identify_next = False
+                    ws_params.update(resume=False, session=None, sequence=None, gateway=None)
+                    continue
+
                 ws_params.update(
                     sequence=self.ws.sequence,
                     resume=e.resume,
                     session=self.ws.session_id,
+                    gateway=self.ws.gateway if e.resume else None,
                 )
                 continue
             except (
@@ -241,6 +506,9 @@ class RoboLia(commands.Bot):
                 asyncio.TimeoutError,
             ) as exc:
                 self.dispatch("disconnect")
+                if self._suspending:
+                    return
+
                 if not reconnect:
                     await self.close()
                     if isinstance(exc, discord.ConnectionClosed) and exc.code == 1000:
@@ -250,9 +518,13 @@ class RoboLia(commands.Bot):
                 if self.is_closed():
                     return
 
-                if isinstance(exc, OSError) and exc.errno in (54, 10054):
+                if self.ws is None:
+                    # Never connected, a persisted session may be what failed, so IDENTIFY.
+                    ws_params.update(resume=False, session=None, sequence=None, gateway=None)
+                elif isinstance(exc, OSError) and exc.errno in (54, 10054):
                     ws_params.update(
                         sequence=self.ws.sequence,
+                        gateway=self.ws.gateway,
                         initial=False,
                         resume=True,
                         session=self.ws.session_id,
@@ -269,7 +541,13 @@ class RoboLia(commands.Bot):
                 retry: float = backoff.delay()
                 self.logger.exception("Attempting a reconnect in %.2fs.", retry)
                 await asyncio.sleep(retry)
-                ws_params.update(sequence=self.ws.sequence, resume=True, session=self.ws.session_id)
+                if self.ws is not None:
+                    ws_params.update(
+                        sequence=self.ws.sequence,
+                        gateway=self.ws.gateway,
+                        resume=True,
+                        session=self.ws.session_id,
+                    )
 
     async def connection(self, *, timeout: float = 10.0) -> PostgreSQLManager:
         return PostgreSQLManager(self.pool, timeout=timeout)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Literal, Optional
+
+from discord.ext import commands
+
+from base import EmbedBuilder, MemoryReport, PostgreSQLManager
+from utils import RoboLiaContext, humanize_bytes
+
+if TYPE_CHECKING:
+    from asyncpg import Record
+
+    from bot import RoboLia
+
+__all__: tuple[str, ...] = ("Maintenance",)
+
+
+log: Logger = getLogger(__name__)
+
+BACKFILLS: dict[str, str] = {
+    "scores": "SELECT backfill_owo_counting_daily()",
+    "presence": "SELECT backfill_presence_sessions()",
+}
+
+
+class Maintenance(commands.Cog):
+    """Owner-only housekeeping commands."""
+
+    def __init__(self, bot: RoboLia) -> None:
+        self.bot: RoboLia = bot
+
+    async def cog_check(self, ctx: RoboLiaContext) -> bool:  # type: ignore[override]
+        return await self.bot.is_owner(ctx.author)
+
+    @commands.group(name="maintenance", aliases=["mt"], hidden=True, invoke_without_command=True)
+    async def maintenance(self, ctx: RoboLiaContext) -> None:
+        await ctx.send_help(ctx.command)
+
+    @maintenance.command(name="backfill")
+    async def backfill(self, ctx: RoboLiaContext, target: Literal["scores", "presence"]) -> None:
+        """Rebuilds a derived table from its raw history."""
+        async with ctx.typing():
+            start: float = time.perf_counter()
+            manager: PostgreSQLManager = await self.bot.connection()
+            # A write, despite going through fetchone, so keep it transactional.
+            record: Optional[Record] = await manager.fetchone(BACKFILLS[target], timeout=None, strategy=manager.strategy)
+            elapsed: float = time.perf_counter() - start
+
+        rows: int = record[0] if record is not None else 0
+        log.info("Backfilled %r with %s rows in %.2fs.", target, rows, elapsed)
+        await ctx.send(embed=EmbedBuilder(title=f"Backfilled {target}", description=f"{rows:,} rows in {elapsed:.2f}s."))
+
+    @maintenance.command(name="memory", aliases=["mem"])
+    async def memory(self, ctx: RoboLiaContext) -> None:
+        """Breaks down the memory held by discord.py's caches."""
+        start: float = time.perf_counter()
+        report: MemoryReport = await MemoryReport.collect(
+            self.bot, self.bot.presence.presences, lane=self.bot.executors.blocking
+        )
+        elapsed: float = time.perf_counter() - start
+
+        embed: EmbedBuilder = EmbedBuilder(
+            title="Cache memory",
+            description=f"{humanize_bytes(report.total)} across caches, {humanize_bytes(report.peak_rss)} peak RSS.",
+        )
+        for cache in report.caches:
+            embed.add_field(name=cache.name.title(), value=f"{cache.count:,} objects\n{humanize_bytes(cache.size)}")
+        embed.set_footer(text=f"Walked in {elapsed * 1000:.0f}ms, {self.bot.members.evicted:,} members evicted so far.")
+        await ctx.send(embed=embed)
+
+
+async def setup(bot: RoboLia) -> None:
+    await bot.add_cog(Maintenance(bot))
@@ -0,0 +1,10 @@
+-- requires: prerequisites/user.sql, additional/avatar_store.sql
+
+-- Maps where an avatar was downloaded from (user id and Discord's avatar hash) to the
+-- stored blob, so an avatar that was already fetched once is never downloaded again.
+CREATE TABLE IF NOT EXISTS avatar_sources (
+    source TEXT PRIMARY KEY NOT NULL,
+    avatar_hash BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL,
+    CONSTRAINT avatar_sources_hash_fk FOREIGN KEY (avatar_hash) REFERENCES avatar_blobs(hash) ON DELETE CASCADE
+);
@@ -0,0 +1,56 @@
+-- requires: prerequisites/user.sql
+
+-- Upgrades avatar_history tables created before the content-addressed store existed,
+-- moving every inline avatar into avatar_blobs. Does nothing on fresh databases.
+ALTER TABLE avatar_history ADD COLUMN IF NOT EXISTS avatar_hash BYTEA;
+
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = 'avatar_history' AND column_name = 'avatar'
+  ) THEN
+    INSERT INTO avatar_blobs (hash, format, size, avatar)
+    SELECT DISTINCT ON (sha256(avatar)) sha256(avatar), format, octet_length(avatar), avatar
+    FROM avatar_history
+    ON CONFLICT (hash) DO NOTHING;
+
+    UPDATE avatar_history SET avatar_hash = sha256(avatar) WHERE avatar_hash IS NULL;
+
+    ALTER TABLE avatar_history DROP COLUMN avatar, DROP COLUMN format;
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'avatar_history_hash_fk') THEN
+    ALTER TABLE avatar_history
+    ADD CONSTRAINT avatar_history_hash_fk FOREIGN KEY (avatar_hash) REFERENCES avatar_blobs(hash);
+  END IF;
+END;
+$$;
+
+ALTER TABLE avatar_history ALTER COLUMN avatar_hash SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS avatar_history_uid_changed_at_idx ON avatar_history (uid, changed_at DESC);
+
+
+DROP FUNCTION IF EXISTS insert_avatar_history_item(BIGINT, TEXT, BYTEA);
+
+-- Returns whether a history row was added, i.e. the hash differs from the user's latest avatar.
+CREATE OR REPLACE FUNCTION insert_avatar_history_item(p_user_id BIGINT, p_hash BYTEA)
+RETURNS BOOLEAN AS $$
+BEGIN
+  IF EXISTS (
+    WITH last_avatar AS (
+      SELECT avatar_hash FROM avatar_history
+      WHERE uid = p_user_id
+      ORDER BY changed_at DESC
+      LIMIT 1
+    )
+    SELECT 1 FROM last_avatar WHERE avatar_hash = p_hash
+  ) THEN
+    RETURN FALSE;
+  END IF;
+
+  INSERT INTO avatar_history (uid, avatar_hash) VALUES (p_user_id, p_hash);
+  RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
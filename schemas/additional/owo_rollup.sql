@@ -0,0 +1,116 @@
+-- requires: prerequisites/user.sql
+
+CREATE TABLE IF NOT EXISTS owo_counting_daily (
+  uid BIGINT NOT NULL,
+  day DATE NOT NULL,
+  word TEXT NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  CONSTRAINT owo_counting_daily_pk PRIMARY KEY (uid, day, word),
+  CONSTRAINT owo_counting_daily_uid_fk FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS owo_counting_daily_day_idx ON owo_counting_daily (day, word);
+
+
+-- A score day runs from 08:00 UTC to 08:00 UTC the next day.
+CREATE OR REPLACE FUNCTION owo_score_day(ts TIMESTAMP WITH TIME ZONE) RETURNS DATE AS $$
+  SELECT ((ts AT TIME ZONE 'UTC') - INTERVAL '8 hours')::DATE;
+$$ LANGUAGE sql IMMUTABLE;
+
+
+-- Statement level, so a single COPY of a thousand rows is one upsert per (uid, day, word).
+CREATE OR REPLACE FUNCTION owo_counting_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO owo_counting_daily (uid, day, word, count)
+  SELECT n.uid, owo_score_day(n.created_at), n.word, COUNT(*)
+  FROM new_rows n
+  GROUP BY 1, 2, 3
+  ON CONFLICT (uid, day, word) DO UPDATE SET count = owo_counting_daily.count + EXCLUDED.count;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'owo_counting_rollup') THEN
+    CREATE TRIGGER owo_counting_rollup
+    AFTER INSERT ON owo_counting
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE owo_counting_rollup();
+  END IF;
+END;
+$$;
+
+
+-- Rebuilds the rollup from the raw history, returns the number of rollup rows.
+CREATE OR REPLACE FUNCTION backfill_owo_counting_daily()
+RETURNS BIGINT AS $$
+DECLARE
+  total BIGINT;
+BEGIN
+  -- Hold off concurrent inserts, their trigger would otherwise count them twice.
+  LOCK TABLE owo_counting IN SHARE MODE;
+  TRUNCATE owo_counting_daily;
+
+  INSERT INTO owo_counting_daily (uid, day, word, count)
+  SELECT uid, owo_score_day(created_at), word, COUNT(*)
+  FROM owo_counting
+  GROUP BY 1, 2, 3;
+
+  GET DIAGNOSTICS total = ROW_COUNT;
+  RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION get_score_counts(p_uid BIGINT) RETURNS TABLE (
+  daily_score INTEGER,
+  yesterday_score INTEGER,
+  weekly_score INTEGER,
+  last_week_score INTEGER,
+  this_week_score INTEGER,
+  last_month_score INTEGER,
+  this_month_score INTEGER
+) AS $$
+DECLARE
+  today CONSTANT DATE := owo_score_day(now());
+  week_start CONSTANT DATE := date_trunc('week', today)::DATE;
+  month_start CONSTANT DATE := date_trunc('month', today)::DATE;
+  last_month_start CONSTANT DATE := (date_trunc('month', today) - INTERVAL '1 month')::DATE;
+BEGIN
+  -- At most ~62 days * 3 words of rollup rows, regardless of the user's history.
+  RETURN QUERY
+  SELECT
+    COALESCE(SUM(d.count) FILTER (WHERE d.day = today), 0)::INTEGER,
+    COALESCE(SUM(d.count) FILTER (WHERE d.day = today - 1), 0)::INTEGER,
+    COALESCE(SUM(d.count) FILTER (WHERE d.day > today - 7), 0)::INTEGER,
+    COALESCE(SUM(d.count) FILTER (WHERE d.day >= week_start - 7 AND d.day < week_start), 0)::INTEGER,
+    COALESCE(SUM(d.count) FILTER (WHERE d.day >= week_start), 0)::INTEGER,
+    COALESCE(SUM(d.count) FILTER (WHERE d.day >= last_month_start AND d.day < month_start), 0)::INTEGER,
+    COALESCE(SUM(d.count) FILTER (WHERE d.day >= month_start), 0)::INTEGER
+  FROM owo_counting_daily d
+  WHERE d.uid = p_uid
+  AND d.day >= LEAST(today - 6, week_start - 7, last_month_start);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+
+CREATE OR REPLACE FUNCTION get_score_leaderboard(
+  p_start DATE,
+  p_end DATE,
+  p_word TEXT DEFAULT NULL,
+  p_limit INTEGER DEFAULT 10
+) RETURNS TABLE (
+  uid BIGINT,
+  score BIGINT
+) AS $$
+  SELECT d.uid, SUM(d.count)::BIGINT AS score
+  FROM owo_counting_daily d
+  WHERE d.day >= p_start AND d.day < p_end
+  AND (p_word IS NULL OR d.word = p_word)
+  GROUP BY d.uid
+  ORDER BY score DESC
+  LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
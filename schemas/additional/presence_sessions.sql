@@ -0,0 +1,154 @@
+-- requires: prerequisites/user.sql
+
+-- One row per uninterrupted stretch of a single status, the open one has no end.
+CREATE TABLE IF NOT EXISTS presence_sessions (
+  id BIGSERIAL PRIMARY KEY NOT NULL,
+  uid BIGINT NOT NULL,
+  status TEXT NOT NULL,
+  started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  ended_at TIMESTAMP WITH TIME ZONE,
+  seconds BIGINT,
+  CONSTRAINT presence_sessions_uid_fk FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE,
+  CONSTRAINT presence_sessions_status_check CHECK (status IN ('Online', 'Idle', 'DND', 'Offline'))
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS presence_sessions_open_idx ON presence_sessions (uid) WHERE ended_at IS NULL;
+CREATE INDEX IF NOT EXISTS presence_sessions_uid_started_at_idx ON presence_sessions (uid, started_at);
+
+
+-- Closed session time per UTC day, sessions crossing midnight are split.
+CREATE TABLE IF NOT EXISTS presence_daily (
+  uid BIGINT NOT NULL,
+  day DATE NOT NULL,
+  status TEXT NOT NULL,
+  seconds BIGINT NOT NULL DEFAULT 0,
+  CONSTRAINT presence_daily_pk PRIMARY KEY (uid, day, status),
+  CONSTRAINT presence_daily_uid_fk FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE
+);
+
+
+CREATE OR REPLACE FUNCTION presence_split_days(p_from TIMESTAMP WITH TIME ZONE, p_to TIMESTAMP WITH TIME ZONE)
+RETURNS TABLE (
+  day DATE,
+  seconds BIGINT
+) AS $$
+  SELECT
+    g.day::DATE,
+    EXTRACT(EPOCH FROM (
+      LEAST(p_to AT TIME ZONE 'UTC', g.day + INTERVAL '1 day') - GREATEST(p_from AT TIME ZONE 'UTC', g.day)
+    ))::BIGINT
+  FROM generate_series(date_trunc('day', p_from AT TIME ZONE 'UTC'), p_to AT TIME ZONE 'UTC', INTERVAL '1 day') AS g(day)
+  WHERE LEAST(p_to AT TIME ZONE 'UTC', g.day + INTERVAL '1 day') > GREATEST(p_from AT TIME ZONE 'UTC', g.day);
+$$ LANGUAGE sql IMMUTABLE;
+
+
+CREATE OR REPLACE FUNCTION presence_sessionize()
+RETURNS TRIGGER AS $$
+DECLARE
+  open_session presence_sessions%ROWTYPE;
+BEGIN
+  SELECT * INTO open_session FROM presence_sessions WHERE uid = NEW.uid AND ended_at IS NULL FOR UPDATE;
+
+  IF FOUND THEN
+    -- Repeated statuses extend the session, late rows can not rewrite closed history.
+    IF open_session.status = NEW.status OR NEW.changed_at < open_session.started_at THEN
+      RETURN NULL;
+    END IF;
+
+    UPDATE presence_sessions
+    SET ended_at = NEW.changed_at,
+        seconds = EXTRACT(EPOCH FROM (NEW.changed_at - open_session.started_at))::BIGINT
+    WHERE id = open_session.id;
+
+    INSERT INTO presence_daily (uid, day, status, seconds)
+    SELECT NEW.uid, s.day, open_session.status, s.seconds
+    FROM presence_split_days(open_session.started_at, NEW.changed_at) s
+    ON CONFLICT (uid, day, status) DO UPDATE SET seconds = presence_daily.seconds + EXCLUDED.seconds;
+  END IF;
+
+  INSERT INTO presence_sessions (uid, status, started_at) VALUES (NEW.uid, NEW.status, NEW.changed_at);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'presence_sessionize') THEN
+    CREATE TRIGGER presence_sessionize
+    AFTER INSERT ON presence_history
+    FOR EACH ROW EXECUTE PROCEDURE presence_sessionize();
+  END IF;
+END;
+$$;
+
+
+-- Rebuilds sessions and daily totals from the raw history, returns the number of sessions.
+CREATE OR REPLACE FUNCTION backfill_presence_sessions()
+RETURNS BIGINT AS $$
+DECLARE
+  total BIGINT;
+BEGIN
+  LOCK TABLE presence_history IN SHARE MODE;
+  TRUNCATE presence_sessions, presence_daily;
+
+  INSERT INTO presence_sessions (uid, status, started_at, ended_at, seconds)
+  WITH changes AS (
+    SELECT h.uid, h.status, h.changed_at,
+      LAG(h.status) OVER (PARTITION BY h.uid ORDER BY h.changed_at, h.id) AS previous_status
+    FROM presence_history h
+  ), sessions AS (
+    SELECT c.uid, c.status, c.changed_at AS started_at,
+      LEAD(c.changed_at) OVER (PARTITION BY c.uid ORDER BY c.changed_at) AS ended_at
+    FROM changes c
+    WHERE c.previous_status IS DISTINCT FROM c.status
+  )
+  SELECT s.uid, s.status, s.started_at, s.ended_at, EXTRACT(EPOCH FROM (s.ended_at - s.started_at))::BIGINT
+  FROM sessions s;
+
+  GET DIAGNOSTICS total = ROW_COUNT;
+
+  INSERT INTO presence_daily (uid, day, status, seconds)
+  SELECT s.uid, d.day, s.status, SUM(d.seconds)
+  FROM presence_sessions s
+  CROSS JOIN LATERAL presence_split_days(s.started_at, s.ended_at) d
+  WHERE s.ended_at IS NOT NULL
+  GROUP BY 1, 2, 3;
+
+  RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION get_total_seconds(user_id BIGINT, days INTEGER DEFAULT NULL)
+RETURNS TABLE (
+  status TEXT,
+  total_seconds BIGINT
+) AS $$
+DECLARE
+  first_day DATE;
+  window_start TIMESTAMP WITH TIME ZONE;
+BEGIN
+  -- The last `days` UTC days, today included, at day granularity.
+  IF days IS NOT NULL THEN
+    first_day := (now() AT TIME ZONE 'UTC')::DATE - (days - 1);
+    window_start := first_day::TIMESTAMP AT TIME ZONE 'UTC';
+  END IF;
+
+  RETURN QUERY
+  SELECT t.status, SUM(t.seconds)::BIGINT
+  FROM (
+    SELECT d.status, d.seconds
+    FROM presence_daily d
+    WHERE d.uid = user_id
+    AND (first_day IS NULL OR d.day >= first_day)
+    UNION ALL
+    SELECT o.status, EXTRACT(EPOCH FROM (now() - GREATEST(o.started_at, window_start)))::BIGINT
+    FROM presence_sessions o
+    WHERE o.uid = user_id
+    AND o.ended_at IS NULL
+  ) t
+  GROUP BY t.status
+  ORDER BY 2 DESC;
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -34,111 +34,22 @@ CREATE TABLE IF NOT EXISTS item_history (
 );
 
 
-CREATE TABLE IF NOT EXISTS avatar_history (
-    id BIGSERIAL PRIMARY KEY NOT NULL,
-    uid BIGINT NOT NULL,
+-- Avatars are stored once, keyed by their SHA-256, history rows only reference the hash.
+CREATE TABLE IF NOT EXISTS avatar_blobs (
+    hash BYTEA PRIMARY KEY NOT NULL,
     format TEXT NOT NULL,
+    size INTEGER NOT NULL,
     avatar BYTEA NOT NULL,
-    changed_at TIMESTAMP WITH TIME ZONE DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL,
-    CONSTRAINT avatar_history_uid_fk FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL,
+    CONSTRAINT avatar_blobs_hash_check CHECK (octet_length(hash) = 32)
 );
 
 
-CREATE OR REPLACE FUNCTION get_score_counts(p_uid BIGINT) RETURNS TABLE (
-  daily_score INTEGER,
-  yesterday_score INTEGER,
-  weekly_score INTEGER,
-  last_week_score INTEGER,
-  this_week_score INTEGER,
-  last_month_score INTEGER,
-  this_month_score INTEGER
-) AS $$
-DECLARE
-  time_ranges CONSTANT INTERVAL[] := ARRAY[
-    '8 hours'::INTERVAL, '1 day 8 hours'::INTERVAL, '1 week'::INTERVAL,
-    '2 weeks'::INTERVAL, '1 week'::INTERVAL, '1 month'::INTERVAL, '2 months'::INTERVAL
-  ];
-  score_counts INTEGER[];
-  i INTEGER;
-  start_date TIMESTAMP WITH TIME ZONE;
-  end_date TIMESTAMP WITH TIME ZONE;
-BEGIN
-  -- Fixed length array
-  FOR i IN 1..ARRAY_LENGTH(time_ranges, 1) LOOP
-    score_counts[i] := 0;
-  END LOOP;
-
-  FOR i IN 1..ARRAY_LENGTH(time_ranges, 1) LOOP
-    IF now()::TIME < '08:00:00' THEN
-      -- If it's before 8am, we subtract an additional day from the start date
-      start_date := now()::DATE - '1 day'::INTERVAL + '8 hours'::INTERVAL - time_ranges[i];
-    ELSE
-      start_date := now()::DATE + '8 hours'::INTERVAL - time_ranges[i];
-    END IF;
-    end_date := start_date + time_ranges[i-1];
-    SELECT
-      SUM(CASE WHEN created_at >= start_date AND created_at < end_date THEN 1 ELSE 0 END)
-    FROM owo_counting JOIN users ON owo_counting.uid = users.uid
-    WHERE uid = p_uid
-    INTO score_counts[i];
-    END LOOP;
-
-    RETURN QUERY SELECT * FROM score_counts;
-END;
-$$ LANGUAGE plpgsql;
-
-
-CREATE OR REPLACE FUNCTION insert_avatar_history_item(p_user_id bigint, p_format text, p_avatar bytea)
-RETURNS void AS $$
-BEGIN
-    IF NOT EXISTS (
-        WITH last_avatar AS (
-            SELECT avatar FROM avatar_history
-            WHERE uid = p_user_id
-            ORDER BY changed_at DESC
-            LIMIT 1
-        )
-        SELECT 1 FROM last_avatar WHERE avatar = p_avatar
-    ) THEN
-        INSERT INTO avatar_history (uid, format, avatar) VALUES (p_user_id, p_format, p_avatar);
-    END IF;
-END;
-$$ LANGUAGE plpgsql;
-
-
-CREATE OR REPLACE FUNCTION get_total_seconds(user_id BIGINT, days INTEGER DEFAULT NULL)
-RETURNS TABLE (
-  status TEXT,
-  total_seconds BIGINT
-) AS $$
-DECLARE
-  accumulated_seconds BIGINT;
-  start_date TIMESTAMP;
-BEGIN
-    accumulated_seconds := 0;
-    IF days IS NOT NULL THEN
-        start_date := now() - INTERVAL '1 DAY' * days;
-    ELSE
-        start_date := NULL;
-    END IF;
-    RETURN QUERY
-    SELECT 
-        sc.status,
-        CAST(SUM(EXTRACT(EPOCH FROM (COALESCE(sc.next_changed_at, now()) - sc.changed_at))) AS BIGINT) AS total_seconds
-    FROM (
-        SELECT 
-        sh.status,
-        sh.changed_at,
-        LEAD(sh.changed_at) OVER (
-            PARTITION BY sh.id 
-            ORDER BY sh.changed_at 
-            ROWS BETWEEN CURRENT ROW AND UNBOUNDED FOLLOWING
-        ) AS next_changed_at
-        FROM presence_history sh
-        WHERE sh.id = user_id
-        AND (start_date IS NULL OR sh.changed_at >= start_date)
-    ) sc
-    GROUP BY sc.status
-    ORDER BY MIN(sc.changed_at);
-END;
-$$ LANGUAGE plpgsql;
+CREATE TABLE IF NOT EXISTS avatar_history (
+    id BIGSERIAL PRIMARY KEY NOT NULL,
+    uid BIGINT NOT NULL,
+    avatar_hash BYTEA NOT NULL,
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL,
+    CONSTRAINT avatar_history_uid_fk FOREIGN KEY (uid) REFERENCES users(uid) ON DELETE CASCADE,
+    CONSTRAINT avatar_history_hash_fk FOREIGN KEY (avatar_hash) REFERENCES avatar_blobs(hash)
+);
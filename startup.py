@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import ast
+import asyncio
+import importlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import ModuleType
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional, Sequence
+
+import attr
+
+__all__: tuple[str, ...] = ("StartupGraph", "StartupProfiler", "profiler", "warm_imports")
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False, eq=False)
+class Node:
+    name: str
+    elapsed: float = attr.ib(default=0.0)
+    children: list[Node] = attr.ib(factory=list)
+
+    @property
+    def own(self) -> float:
+        # Concurrent children overlap, their sum can exceed the parent.
+        return max(self.elapsed - sum(child.elapsed for child in self.children), 0.0)
+
+    def render(self, lines: list[str], *, depth: int = 0, threshold: float = 0.0) -> None:
+        lines.append(f"{'  ' * depth}{self.name}: {self.elapsed * 1000:.1f}ms (self {self.own * 1000:.1f}ms)")
+        for child in sorted(self.children, key=lambda child: child.elapsed, reverse=True):
+            if child.elapsed >= threshold:
+                child.render(lines, depth=depth + 1, threshold=threshold)
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, profiler: StartupProfiler, loader: Any) -> None:
+        self._profiler: StartupProfiler = profiler
+        self._loader: Any = loader
+
+    def create_module(self, spec: importlib.machinery.ModuleSpec) -> Optional[ModuleType]:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        with self._profiler._measure(self._profiler._imports, module.__name__):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name: str) -> Any:
+        # get_resource_reader, is_package and friends.
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, profiler: StartupProfiler) -> None:
+        self._profiler: StartupProfiler = profiler
+
+    def find_spec(
+        self, fullname: str, path: Optional[Sequence[str]], target: Optional[ModuleType] = None
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec: Optional[importlib.machinery.ModuleSpec] = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(self._profiler, spec.loader)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    """Times imports and startup phases, both reported as trees.
+
+    Imports are timed by a meta path finder wrapping every loader, nested imports
+    show up below the module that triggered them. Phases are marked with `phase`,
+    which nests per task, so concurrent phases each get their own branch.
+
+    Disabled until `enable` is called, `phase` costs next to nothing until then.
+
+    Example
+    -------
+    >>> profiler.enable()
+    >>> with profiler.phase("setup.pool"):
+    ...     pool = await RoboLia.setup_pool(dsn=settings.dsn)
+    >>> print(profiler.report())
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.started: float = time.perf_counter()
+
+        self._imports: Node = Node(name="imports")
+        self._phases: Node = Node(name="phases")
+        # Separate stacks, an import triggered inside a phase belongs in the import tree.
+        self._stacks: dict[int, ContextVar[Optional[Node]]] = {
+            id(self._imports): ContextVar("startup_profiler_import", default=None),
+            id(self._phases): ContextVar("startup_profiler_phase", default=None),
+        }
+        self._finder: _TimingFinder = _TimingFinder(self)
+
+    def enable(self) -> None:
+        if not self.enabled:
+            self.enabled = True
+            self.started = time.perf_counter()
+            sys.meta_path.insert(0, self._finder)
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    @contextmanager
+    def _measure(self, root: Node, name: str) -> Iterator[None]:
+        stack: ContextVar[Optional[Node]] = self._stacks[id(root)]
+        node: Node = Node(name=name)
+        (stack.get() or root).children.append(node)
+
+        token = stack.set(node)
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            node.elapsed = time.perf_counter() - start
+            stack.reset(token)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        with self._measure(self._phases, name):
+            yield
+
+    def report(self, *, threshold: float = 0.001) -> str:
+        """Renders both trees, hiding anything faster than ``threshold`` seconds."""
+        self._imports.elapsed = sum(child.elapsed for child in self._imports.children)
+        self._phases.elapsed = sum(child.elapsed for child in self._phases.children)
+
+        lines: list[str] = [f"startup: {(time.perf_counter() - self.started) * 1000:.1f}ms wall clock"]
+        self._imports.render(lines, depth=1, threshold=threshold)
+        self._phases.render(lines, depth=1, threshold=threshold)
+        return "\n".join(lines)
+
+
+profiler: StartupProfiler = StartupProfiler()
+
+
+def warm_imports(name: str) -> list[str]:
+    """Compiles module ``name`` and imports what it imports at the top level, without executing it.
+
+    Modules of ``name``'s own top-level package are left alone, they may be extensions
+    that are loaded separately. Returns the modules it imports from.
+    """
+    spec: Optional[importlib.machinery.ModuleSpec] = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None or not hasattr(spec.loader, "get_source"):
+        return []
+
+    source: Optional[str] = spec.loader.get_source(name)
+    if source is None:
+        return []
+
+    # Writes the bytecode cache, the module is then only unmarshalled when it is loaded.
+    spec.loader.get_code(name)
+
+    package: str = name if spec.submodule_search_locations is not None else name.rpartition(".")[0]
+    own: str = name.partition(".")[0]
+    imported: list[str] = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Import):
+            dependencies: list[tuple[str, list[str]]] = [(alias.name, []) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            module: str = importlib.util.resolve_name("." * node.level + (node.module or ""), package)
+            # The names may be submodules, as in `from discord.ext import commands`.
+            dependencies = [(module, [alias.name for alias in node.names if alias.name != "*"])]
+        else:
+            # Anything under `if TYPE_CHECKING:` or in a function is not needed to load it.
+            continue
+
+        for dependency, names in dependencies:
+            if dependency.partition(".")[0] != own:
+                __import__(dependency, fromlist=names)
+                imported.append(dependency)
+
+    return imported
+
+
+class StartupGraph:
+    """Runs startup steps concurrently, each one as soon as the steps it depends on are done.
+
+    Every step is timed as a `profiler` phase. If a step raises, the steps after it
+    raise the same exception, the others are cancelled and `run` raises it. Steps
+    that must not take startup down with them catch their own exceptions.
+
+    Example
+    -------
+    >>> graph = StartupGraph()
+    >>> graph.add("pool", lambda: RoboLia.setup_pool(dsn=settings.dsn))
+    >>> graph.add("redis", lambda: RoboLia.setup_redis(url=settings.redis))
+    >>> graph.add("presence", tracker.load, after=("pool",))
+    >>> results = await graph.run()
+    """
+
+    def __init__(self) -> None:
+        self._steps: dict[str, tuple[Callable[[], Awaitable[Any]], tuple[str, ...]]] = {}
+        self.results: dict[str, Any] = {}
+
+    def add(self, name: str, func: Callable[[], Awaitable[Any]], *, after: Iterable[str] = ()) -> None:
+        """Adds a step, the steps it runs ``after`` have to be added first, so there are no cycles."""
+        if name in self._steps:
+            raise ValueError(f"Duplicate startup step {name!r}.")
+
+        dependencies: tuple[str, ...] = tuple(after)
+        for dependency in dependencies:
+            if dependency not in self._steps:
+                raise ValueError(f"Startup step {name!r} depends on unknown step {dependency!r}.")
+
+        self._steps[name] = (func, dependencies)
+
+    async def _run_step(
+        self, name: str, func: Callable[[], Awaitable[Any]], dependencies: list[asyncio.Task[Any]]
+    ) -> Any:
+        if dependencies:
+            await asyncio.gather(*dependencies)
+
+        with profiler.phase(name):
+            result: Any = await func()
+
+        self.results[name] = result
+        return result
+
+    async def run(self) -> dict[str, Any]:
+        tasks: dict[str, asyncio.Task[Any]] = {}
+        for name, (func, dependencies) in self._steps.items():
+            tasks[name] = asyncio.create_task(
+                self._run_step(name, func, [tasks[dependency] for dependency in dependencies]),
+                name=f"robolia-startup:{name}",
+            )
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return self.results
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from utils import AsyncCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_concurrent_misses_share_one_load() -> None:
+    async def main() -> None:
+        cache: AsyncCache[str, int] = AsyncCache()
+        calls: int = 0
+
+        async def load() -> int:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 42
+
+        assert await asyncio.gather(*(cache.get("key", load) for _ in range(10))) == [42] * 10
+        assert calls == 1
+        assert cache.stats.loads == 1 and cache.stats.misses == 10
+
+        assert await cache.get("key", load) == 42
+        assert calls == 1 and cache.stats.hits == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_keeps_the_load_alive() -> None:
+    async def main() -> None:
+        cache: AsyncCache[str, int] = AsyncCache()
+        release: asyncio.Event = asyncio.Event()
+
+        async def load() -> int:
+            await release.wait()
+            return 1
+
+        first: asyncio.Task[int] = asyncio.create_task(cache.get("key", load))
+        second: asyncio.Task[int] = asyncio.create_task(cache.get("key", load))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        release.set()
+        assert await second == 1
+        assert cache.get_nowait("key") == 1
+        assert cache.stats.loads == 1
+
+    asyncio.run(main())
+
+
+def test_failed_load_is_not_cached() -> None:
+    async def main() -> None:
+        cache: AsyncCache[str, int] = AsyncCache()
+
+        async def fail() -> int:
+            raise RuntimeError("boom")
+
+        async def load() -> int:
+            return 2
+
+        with pytest.raises(RuntimeError):
+            await cache.get("key", fail)
+        assert "key" not in cache and cache.stats.failures == 1
+        assert await cache.get("key", load) == 2
+
+    asyncio.run(main())
+
+
+def test_invalidated_load_is_not_cached() -> None:
+    async def main() -> None:
+        cache: AsyncCache[str, int] = AsyncCache()
+        release: asyncio.Event = asyncio.Event()
+
+        async def load() -> int:
+            await release.wait()
+            return 1
+
+        task: asyncio.Task[int] = asyncio.create_task(cache.get("key", load))
+        await asyncio.sleep(0)
+        cache.invalidate("key")
+        release.set()
+
+        assert await task == 1
+        assert "key" not in cache
+
+    asyncio.run(main())
+
+
+def test_ttl_expiry() -> None:
+    clock: Clock = Clock()
+    cache: AsyncCache[str, int] = AsyncCache(ttl=10.0, clock=clock)
+    cache.set("key", 1)
+    cache.set("short", 2, ttl=1.0)
+
+    clock.now = 5.0
+    assert cache.get_nowait("key") == 1
+    assert cache.get_nowait("short") is None
+
+    clock.now = 10.0
+    assert cache.get_nowait("key") is None
+    assert cache.stats.expirations == 2 and len(cache) == 0
+
+
+def test_lru_eviction() -> None:
+    cache: AsyncCache[str, int] = AsyncCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get_nowait("a") == 1  # Now "b" is the least recently used.
+
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get_nowait("a") == 1 and cache.get_nowait("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_maxsize_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        AsyncCache(maxsize=0)
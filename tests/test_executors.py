@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from base.executors import ExecutorLane, LaneConfig
+
+
+def test_process_lane_measures_wait() -> None:
+    async def main() -> float:
+        lane: ExecutorLane = ExecutorLane("cpu", LaneConfig(workers=1, max_pending=8, processes=True))
+        try:
+            await lane.run(time.sleep, 0.0)  # Spawn the worker outside the measurement.
+            before: float = lane.stats.wait_time
+            # One worker, so the second and third call queue behind the first.
+            await asyncio.gather(*(lane.run(time.sleep, 0.2) for _ in range(3)))
+            return lane.stats.wait_time - before
+        finally:
+            await lane.close()
+
+    # 0.2s for the second call plus 0.4s for the third.
+    assert 0.5 < asyncio.run(main()) < 1.0
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import random
+from typing import Any, Awaitable, Callable, Optional
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+
+from base.executors import ExecutorLane, LaneConfig
+from base.fetcher import HASH_INLINE_BYTES, AvatarFetcher, UnsupportedAvatar
+
+
+def png(size: int = 16, *, noise: bool = False) -> bytes:
+    image: Image.Image = Image.new("RGB", (size, size), (0x58, 0x65, 0xF2))
+    if noise:
+        rng: random.Random = random.Random(0)
+        image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(size * size)])
+    buffer: io.BytesIO = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Store:
+    """Stands in for `AvatarStore`, which needs Postgres."""
+
+    def __init__(self, sources: Optional[dict[str, bytes]] = None) -> None:
+        self.sources: dict[str, bytes] = sources or {}
+        self.stored: list[tuple[int, bytes, str, Optional[str], Optional[bytes]]] = []
+        self.recorded: list[tuple[int, bytes]] = []
+
+    @staticmethod
+    def digest(data: bytes) -> bytes:
+        return hashlib.sha256(data).digest()
+
+    async def lookup(self, source: str) -> Optional[bytes]:
+        return self.sources.get(source)
+
+    async def record(self, user_id: int, digest: bytes) -> None:
+        self.recorded.append((user_id, digest))
+
+    async def store(
+        self, user_id: int, data: bytes, format: str, *, source: Optional[str] = None, digest: Optional[bytes] = None
+    ) -> bytes:
+        self.stored.append((user_id, data, format, source, digest))
+        return digest or self.digest(data)
+
+
+class Server:
+    def __init__(self, body: bytes, *, content_type: str = "image/png", delay: float = 0.0) -> None:
+        self.body: bytes = body
+        self.content_type: str = content_type
+        self.delay: float = delay
+        self.requests: int = 0
+        self.active: int = 0
+        self.peak: int = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return web.Response(body=self.body, content_type=self.content_type)
+        finally:
+            self.active -= 1
+
+
+Run = Callable[..., Any]
+
+
+@pytest.fixture
+def run() -> Run:
+    def run(server: Server, test: Callable[[AvatarFetcher, str], Awaitable[Any]], **options: Any) -> Any:
+        async def main() -> Any:
+            app: web.Application = web.Application()
+            app.router.add_get("/{name}", server.handle)
+            async with TestServer(app) as http, aiohttp.ClientSession() as session:
+                fetcher: AvatarFetcher = AvatarFetcher(session, options.pop("store", Store()), **options)
+                return await test(fetcher, str(http.make_url("/")))
+
+        return asyncio.run(main())
+
+    return run
+
+
+def test_fetch_stores_the_image(run: Run) -> None:
+    body: bytes = png()
+    store: Store = Store()
+
+    async def test(fetcher: AvatarFetcher, base: str) -> bytes:
+        return await fetcher.fetch(1, base + "a.png", source="1/a")
+
+    assert run(Server(body), test, store=store) == hashlib.sha256(body).digest()
+    assert store.stored == [(1, body, "png", "1/a", hashlib.sha256(body).digest())]
+
+
+def test_per_host_limit(run: Run) -> None:
+    server: Server = Server(png(), delay=0.05)
+
+    async def test(fetcher: AvatarFetcher, base: str) -> None:
+        await asyncio.gather(*(fetcher.fetch(i, f"{base}{i}.png", source=f"{i}/a") for i in range(10)))
+
+    run(server, test, per_host=2)
+    assert server.requests == 10
+    assert server.peak == 2
+
+
+def test_concurrent_fetches_share_a_download(run: Run) -> None:
+    server: Server = Server(png(), delay=0.05)
+
+    async def test(fetcher: AvatarFetcher, base: str) -> tuple[list[bytes], int]:
+        digests: list[bytes] = await asyncio.gather(*(fetcher.fetch(1, base + "a.png", source="1/a") for _ in range(5)))
+        return digests, fetcher.stats.deduplicated
+
+    digests, deduplicated = run(server, test)
+    assert server.requests == 1
+    assert deduplicated == 4
+    assert len(set(digests)) == 1
+
+
+def test_stored_source_is_not_downloaded(run: Run) -> None:
+    server: Server = Server(png())
+    store: Store = Store({"1/a": b"known"})
+
+    async def test(fetcher: AvatarFetcher, base: str) -> bytes:
+        return await fetcher.fetch(1, base + "a.png", source="1/a")
+
+    assert run(server, test, store=store) == b"known"
+    assert server.requests == 0
+    assert store.recorded == [(1, b"known")]
+    assert store.stored == []
+
+
+@pytest.mark.parametrize("body", [b"<html>not an avatar</html>", b"<html>" + b"x" * 4096 + b"</html>"])
+def test_non_image_is_rejected(run: Run, body: bytes) -> None:
+    store: Store = Store()
+
+    async def test(fetcher: AvatarFetcher, base: str) -> None:
+        with pytest.raises(UnsupportedAvatar):
+            await fetcher.fetch(1, base + "a.png", source="1/a")
+        assert fetcher.stats.failures == 1
+
+    run(Server(body, content_type="text/html"), test, store=store)
+    assert store.stored == []
+
+
+def test_large_body_is_hashed_on_the_lane(run: Run) -> None:
+    body: bytes = png(256, noise=True)
+    assert len(body) >= HASH_INLINE_BYTES
+
+    async def test(fetcher: AvatarFetcher, base: str) -> tuple[bytes, int]:
+        lane: ExecutorLane = ExecutorLane("io", LaneConfig(workers=2, max_pending=8))
+        fetcher.lane = lane
+        try:
+            return await fetcher.fetch(1, base + "a.png", source="1/a"), lane.stats.completed
+        finally:
+            await lane.close()
+
+    digest, offloaded = run(Server(body), test)
+    assert digest == hashlib.sha256(body).digest()
+    # Sniffing the first bytes, then hashing the body.
+    assert offloaded == 2
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pytest
+from pandas import DataFrame
+
+from base.match import NGramMatch
+
+OPTIONS: list[str] = ["maintenance backfill", "maintenance memory", "Ping", "ping pong", "presence", "avatar history"]
+
+
+def options(frame: DataFrame) -> list[str]:
+    return list(frame["option"])
+
+
+def test_exact_is_case_and_whitespace_insensitive() -> None:
+    matcher: NGramMatch = NGramMatch(OPTIONS, mode=NGramMatch.EXACT)
+    frame: DataFrame = matcher.match("  PING ")
+
+    assert list(frame.columns) == list(NGramMatch.COLUMNS)
+    assert options(frame) == ["Ping"]
+    assert list(frame["index"]) == [2] and list(frame["score"]) == [1.0]
+    assert matcher.match("pin").empty
+
+
+def test_prefix_prefers_the_closest_completion() -> None:
+    matcher: NGramMatch = NGramMatch(OPTIONS, mode=NGramMatch.PREFIX)
+
+    assert options(matcher.match("p")) == ["Ping", "presence", "ping pong"]
+    assert options(matcher.match("maintenance m")) == ["maintenance memory"]
+    assert matcher.match("zzz").empty
+
+
+def test_fuzzy_tolerates_typos() -> None:
+    matcher: NGramMatch = NGramMatch(OPTIONS)
+    frame: DataFrame = matcher.match("maintenence backfil", limit=2)
+
+    assert options(frame)[0] == "maintenance backfill"
+    assert len(frame) == 2
+    assert list(frame["score"]) == sorted(frame["score"], reverse=True)
+    assert 0.0 < frame["score"].iloc[0] < 1.0
+
+
+def test_fuzzy_threshold_and_limit() -> None:
+    matcher: NGramMatch = NGramMatch(OPTIONS, limit=1)
+
+    assert len(matcher.match("maintenance")) == 1
+    assert (matcher.match("maintenance", limit=10, threshold=0.5)["score"] >= 0.5).all()
+    assert matcher.match("qqqqqq").empty
+
+
+def test_mode_override_and_reindexing() -> None:
+    matcher: NGramMatch = NGramMatch()
+    assert len(matcher) == 0
+
+    replacement: list[str] = ["alpha", "beta"]
+    assert options(matcher.match("beta", replacement, mode=NGramMatch.EXACT)) == ["beta"]
+    assert len(matcher) == 2
+
+
+def test_unknown_mode_and_bad_n() -> None:
+    with pytest.raises(ValueError):
+        NGramMatch(OPTIONS).match("ping", mode=7)
+    with pytest.raises(ValueError):
+        NGramMatch(n=0)
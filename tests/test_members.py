@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+
+from base.members import CachePolicy, MemberCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now: float = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def guild_create(guild_id: int, user_ids: list[int]) -> dict[str, Any]:
+    return {
+        "id": str(guild_id),
+        "members": [{"user": {"id": str(user_id)}} for user_id in user_ids],
+        "presences": [{"user": {"id": str(user_id)}, "status": "online"} for user_id in user_ids],
+    }
+
+
+def cache(clock: Clock) -> MemberCache:
+    bot: Any = SimpleNamespace(user=SimpleNamespace(id=1))
+    return MemberCache(bot, CachePolicy(guild_idle=60.0), tracked={2}, clock=clock)
+
+
+def test_guild_create_of_idle_guild_keeps_tracked_members() -> None:
+    members: MemberCache = cache(Clock())
+    data: dict[str, Any] = guild_create(10, [1, 2, 3, 4])
+
+    members.on_guild_create(data)
+
+    assert [member["user"]["id"] for member in data["members"]] == ["1", "2"]
+    assert data["presences"] == []
+
+
+def test_guild_create_of_active_guild_keeps_every_member() -> None:
+    clock: Clock = Clock()
+    members: MemberCache = cache(clock)
+    members.touch(10, 3)
+    clock.now += 30.0
+    data: dict[str, Any] = guild_create(10, [1, 2, 3, 4])
+
+    members.on_guild_create(data)
+
+    assert [member["user"]["id"] for member in data["members"]] == ["1", "2", "3", "4"]
+    assert data["presences"] == []
+
+
+def test_guild_create_after_guild_idle_trims_again() -> None:
+    clock: Clock = Clock()
+    members: MemberCache = cache(clock)
+    members.touch(10, 3)
+    clock.now += 61.0
+    data: dict[str, Any] = guild_create(10, [1, 2, 3, 4])
+
+    members.on_guild_create(data)
+
+    assert [member["user"]["id"] for member in data["members"]] == ["1", "2"]
+
+
+def test_guild_create_untrimmed_when_disabled() -> None:
+    bot: Any = SimpleNamespace(user=SimpleNamespace(id=1))
+    members: MemberCache = MemberCache(bot, CachePolicy(trim_guilds=False), tracked=set())
+    data: dict[str, Any] = guild_create(10, [1, 2, 3])
+
+    members.on_guild_create(data)
+
+    assert len(data["members"]) == 3 and len(data["presences"]) == 3
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import socket
+from typing import Iterator
+
+import pytest
+
+from base.metrics import StatsD
+
+
+@pytest.fixture
+def server() -> Iterator[socket.socket]:
+    sock: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(2.0)
+    yield sock
+    sock.close()
+
+
+def test_dogstatsd_lines(server: socket.socket) -> None:
+    client: StatsD = StatsD(prefix="robolia")
+    client.configure(*server.getsockname(), tags=("shard:0",))
+    try:
+        client.timing("commands.process", 12.3456, tags=("command:ping",))
+        client.histogram("redis.batch_size", 4)
+        client.increment("gateway.events", tags=("event:message_create",))
+        client.increment("gateway.events", 2, tags=("event:message_create",))
+        client.gauge("cache.members", 10.5)
+        client.flush()
+
+        packet: bytes = server.recv(65535)
+    finally:
+        client._socket.close()  # type: ignore
+
+    assert packet.decode("utf-8").split("\n") == [
+        "robolia.commands.process:12.346|ms|#shard:0,command:ping",
+        "robolia.redis.batch_size:4|h|#shard:0",
+        "robolia.gateway.events:3|c|#shard:0,event:message_create",
+        "robolia.cache.members:10.5|g|#shard:0",
+    ]
+
+
+def test_disabled_client_sends_nothing() -> None:
+    client: StatsD = StatsD()
+    client.increment("gateway.events")
+    client.flush()
+    assert not client.enabled and client._counters == {}
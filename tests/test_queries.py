@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional
+
+import pytest
+from asyncpg import FeatureNotSupportedError, UndefinedTableError
+
+from base.queries import Query, QueryRegistry
+
+
+class Statement:
+    def __init__(self, connection: Connection, sql: str) -> None:
+        self.connection: Connection = connection
+        self.sql: str = sql
+
+    async def fetchval(self, *args: Any, timeout: Optional[float] = None) -> Any:
+        if self.connection.stale.pop(self.sql, False):
+            raise FeatureNotSupportedError("cached plan must not change result type")
+        return (self.sql, args)
+
+
+class Connection:
+    """Stands in for an asyncpg connection, which needs Postgres."""
+
+    def __init__(self, *, missing: frozenset[str] = frozenset()) -> None:
+        self.missing: frozenset[str] = missing
+        self.prepared: list[str] = []
+        self.stale: dict[str, bool] = {}
+        self.transaction: bool = False
+
+    async def prepare(self, sql: str) -> Statement:
+        if sql in self.missing:
+            raise UndefinedTableError("relation does not exist")
+        self.prepared.append(sql)
+        return Statement(self, sql)
+
+    def is_in_transaction(self) -> bool:
+        return self.transaction
+
+
+class Proxy:
+    """Stands in for a pool's connection proxy."""
+
+    def __init__(self, connection: Connection) -> None:
+        self._con: Connection = connection
+
+
+def test_register_is_idempotent() -> None:
+    registry: QueryRegistry = QueryRegistry()
+    query: Query = registry.register("one", "SELECT 1")
+
+    assert registry.register("one", "SELECT 1") is query
+    assert registry["one"] is query and "one" in registry and len(registry) == 1
+    with pytest.raises(ValueError):
+        registry.register("one", "SELECT 2")
+
+
+def test_statements_are_prepared_once_per_connection() -> None:
+    registry: QueryRegistry = QueryRegistry()
+    query: Query = registry.register("one", "SELECT 1")
+    connection: Connection = Connection()
+
+    async def main() -> None:
+        await registry.prepare(connection)
+        # Through a proxy, the statement still belongs to the real connection.
+        assert await registry.run(Proxy(connection), query, "fetchval", 1) == ("SELECT 1", (1,))
+        assert await registry.run(connection, query, "fetchval", 2) == ("SELECT 1", (2,))
+
+    asyncio.run(main())
+    assert connection.prepared == ["SELECT 1"]
+    assert registry.stats["one"].prepares == 1 and registry.stats["one"].hits == 2
+
+
+def test_unpreparable_statements_are_deferred() -> None:
+    registry: QueryRegistry = QueryRegistry()
+    query: Query = registry.register("later", "SELECT * FROM later")
+    connection: Connection = Connection(missing=frozenset({"SELECT * FROM later"}))
+
+    async def main() -> None:
+        await registry.prepare(connection)
+        assert registry.stats["later"].failures == 1
+
+        connection.missing = frozenset()
+        await registry.run(connection, query, "fetchval")
+
+    asyncio.run(main())
+    assert connection.prepared == ["SELECT * FROM later"]
+
+
+def test_stale_plan_is_reprepared_outside_transactions() -> None:
+    registry: QueryRegistry = QueryRegistry()
+    query: Query = registry.register("one", "SELECT 1")
+    connection: Connection = Connection()
+
+    async def main() -> None:
+        await registry.prepare(connection)
+        connection.stale["SELECT 1"] = True
+        assert await registry.run(connection, query, "fetchval") == ("SELECT 1", ())
+
+        connection.stale["SELECT 1"] = True
+        connection.transaction = True
+        with pytest.raises(FeatureNotSupportedError):
+            await registry.run(connection, query, "fetchval")
+
+    asyncio.run(main())
+    assert registry.stats["one"].prepares == 2
+
+
+def test_most_used() -> None:
+    registry: QueryRegistry = QueryRegistry()
+    registry.register("rare", "SELECT 1")
+    registry.register("common", "SELECT 2")
+    registry.stats["common"].hits = 5
+
+    assert [name for name, _ in registry.most_used(1)] == ["common"]
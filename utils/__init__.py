@@ -1,2 +1,3 @@
+from .cache import *
 from .context import *
 from .useful import *
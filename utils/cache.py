@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from logging import Logger, getLogger
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar, overload
+
+import attr
+
+__all__: tuple[str, ...] = ("AsyncCache", "CacheStats")
+
+
+log: Logger = getLogger(__name__)
+
+_K = TypeVar("_K", bound=Hashable)
+_V = TypeVar("_V")
+_D = TypeVar("_D")
+
+
+@attr.s(auto_attribs=True, kw_only=True, slots=True, weakref_slot=False)
+class CacheStats:
+    hits: int = attr.ib(default=0)
+    misses: int = attr.ib(default=0)
+    loads: int = attr.ib(default=0)
+    failures: int = attr.ib(default=0)
+    evictions: int = attr.ib(default=0)
+    expirations: int = attr.ib(default=0)
+
+    @property
+    def hit_ratio(self) -> float:
+        total: int = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class AsyncCache(Generic[_K, _V]):
+    """A bounded TTL + LRU cache with single-flight loading.
+
+    Concurrent misses on the same key share one call to the loader. Entries expire
+    lazily when they are looked up, so no task is ever spawned per entry.
+
+    Parameters
+    ----------
+    maxsize : `int`
+        The maximum number of entries, the least recently used one is evicted first.
+    ttl : `Optional[float]`
+        How long entries live, in seconds. `None` means forever.
+
+    Example
+    -------
+    >>> cache: AsyncCache[int, str] = AsyncCache(maxsize=1000, ttl=60)
+    >>> timezone = await cache.get(user_id, lambda: fetch_timezone(user_id))
+    """
+
+    __slots__: tuple[str, ...] = ("maxsize", "ttl", "stats", "_clock", "_entries", "_inflight")
+
+    def __init__(
+        self,
+        *,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer.")
+
+        self.maxsize: int = maxsize
+        self.ttl: Optional[float] = ttl
+        self.stats: CacheStats = CacheStats()
+
+        self._clock: Callable[[], float] = clock
+        self._entries: OrderedDict[_K, tuple[_V, float]] = OrderedDict()
+        self._inflight: dict[_K, asyncio.Task[_V]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: _K) -> bool:
+        return self._lookup(key) is not None
+
+    def _lookup(self, key: _K) -> Optional[tuple[_V, float]]:
+        entry: Optional[tuple[_V, float]] = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry[1] <= self._clock():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    @overload
+    def get_nowait(self, key: _K) -> Optional[_V]:
+        ...
+
+    @overload
+    def get_nowait(self, key: _K, default: _D) -> _V | _D:
+        ...
+
+    def get_nowait(self, key: _K, default: Optional[_D] = None) -> Optional[_V | _D]:
+        entry: Optional[tuple[_V, float]] = self._lookup(key)
+        if entry is None:
+            self.stats.misses += 1
+            return default
+
+        self.stats.hits += 1
+        return entry[0]
+
+    async def get(self, key: _K, loader: Callable[[], Awaitable[_V]]) -> _V:
+        entry: Optional[tuple[_V, float]] = self._lookup(key)
+        if entry is not None:
+            self.stats.hits += 1
+            return entry[0]
+
+        self.stats.misses += 1
+        task: Optional[asyncio.Task[_V]] = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            self.stats.loads += 1
+            task.add_done_callback(lambda done: self._on_loaded(key, done))
+
+        # Shielded, a cancelled caller must not cancel the load the others wait on.
+        return await asyncio.shield(task)
+
+    def _on_loaded(self, key: _K, task: asyncio.Task[_V]) -> None:
+        # Retrieving the exception here keeps asyncio from warning when every caller left.
+        failed: bool = task.cancelled() or task.exception() is not None
+
+        # Invalidated while loading, the result is stale before it even arrives.
+        if self._inflight.get(key) is not task:
+            return
+
+        del self._inflight[key]
+        if failed:
+            self.stats.failures += 1
+            return
+
+        self.set(key, task.result())
+
+    def set(self, key: _K, value: _V, *, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires: float = float("inf") if ttl is None else self._clock() + ttl
+
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, key: _K) -> None:
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
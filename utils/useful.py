@@ -28,6 +28,8 @@ from typing import (
 
 import discord
 
+from .cache import AsyncCache, CacheStats
+
 if TYPE_CHECKING:
     from bot import RoboLia
 
@@ -36,6 +38,7 @@ _T = TypeVar("_T")
 
 __all__: tuple[str, ...] = (
     "humanize_seconds",
+    "humanize_bytes",
     "format_list",
     "humanize_timedelta",
     "AppInfoCache",
@@ -90,28 +93,36 @@ def humanize_timedelta(delta: timedelta) -> str:
     return humanize_seconds(delta.total_seconds())
 
 
+def humanize_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
 class AppInfoCache:
-    def __init__(self, bot: RoboLia) -> None:
+    def __init__(self, bot: RoboLia, *, ttl: float = 300.0) -> None:
         self.bot: RoboLia = bot
-        self._cached_info: Optional[discord.AppInfo] = None
-        self._lock: asyncio.Lock = asyncio.Lock()
-        self._invalidate_task: Optional[asyncio.Task] = None
+        self._cache: AsyncCache[None, discord.AppInfo] = AsyncCache(maxsize=1, ttl=ttl)
 
-    async def get(self) -> discord.AppInfo:
-        async with self._lock:
-            if self._cached_info is None:
-                self._cached_info = await self.bot.application_info()
-                if self._invalidate_task is not None:
-                    self._invalidate_task.cancel()
+    @property
+    def stats(self) -> CacheStats:
+        return self._cache.stats
 
-                self._invalidate_task = asyncio.create_task(self.defere(300))
+    async def get(self) -> discord.AppInfo:
+        return await self._cache.get(None, self.bot.application_info)
 
-            return self._cached_info
+    def invalidate(self) -> None:
+        self._cache.invalidate(None)
 
     async def defere(self, time: float) -> None:
+        """Invalidates the cached info after ``time`` seconds, kept for existing callers of it.
+
+        Expiry no longer needs it, entries expire on their own after ``ttl`` seconds.
+        """
         await asyncio.sleep(time)
-        async with self._lock:
-            self._cached_info = None
+        self.invalidate()
 
 
 class suppress(AbstractContextManager[None]):